@@ -0,0 +1,170 @@
+# IPP 2023, project 2
+# Author: Marek Gergel, xgerge01
+# File: bench.py
+# Description: Benchmark suite of interpret.py with regression check against stored baseline
+# Date: 2023-04-07
+
+import argparse,json,os,re,subprocess,sys,tempfile
+
+import workloads
+
+ERR_PARAMS = 10
+ERR_FILE = 41
+ERR_REGRESSION = 1
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Macro workloads (programs of tests/koule), they read no input
+MACRO = ("koule_pol", "koule_Lakoc", "koule_JohnyK")
+
+class Config:
+
+    def __init__(self, args):
+        self.engine = args.engine
+        self.optimize = args.O == "1"
+        self.size = args.size
+        self.repeat = args.repeat
+        self.filter = re.compile(args.filter) if args.filter else None
+        self.baseline = args.baseline
+        self.save = args.save
+        self.threshold = args.threshold
+        self.json = args.json
+
+    def key(self) -> str:
+        # Results are comparable only with same engine, optimization and size
+        return f"{self.engine}-O{int(self.optimize)}-size{self.size}"
+
+def parse_params() -> Config:
+    parser = argparse.ArgumentParser(description='Benchmark suite of interpret.py')
+    parser.add_argument('--engine', choices=['interpret', 'compiled', 'jit'], default='interpret', help='execution engine')
+    parser.add_argument('-O', choices=['0', '1'], default='1', help='optimization level')
+    parser.add_argument('--size', metavar='n', type=int, default=1, help=f'microbenchmark size, loops have n*{workloads.ITERATIONS} iterations')
+    parser.add_argument('--repeat', metavar='n', type=int, default=3, help='runs of every benchmark, best run is reported')
+    parser.add_argument('--filter', metavar='regex', type=str, help='run only benchmarks with matching name')
+    parser.add_argument('--baseline', metavar='file', type=str, default=DEFAULT_BASELINE, help='JSON baseline to compare with')
+    parser.add_argument('--save', action='store_true', help='store results to baseline instead of comparing')
+    parser.add_argument('--threshold', metavar='percent', type=float, default=10.0, help='allowed slowdown of instructions per second against baseline')
+    parser.add_argument('--json', metavar='file', type=str, help='write results as JSON to file')
+    args = parser.parse_args()
+
+    if args.size < 1 or args.repeat < 1 or args.threshold < 0:
+        sys.stderr.write("Parameters '--size' and '--repeat' must be positive and '--threshold' not negative\n")
+        sys.exit(ERR_PARAMS)
+    if args.filter:
+        try:
+            re.compile(args.filter)
+        except re.error:
+            sys.stderr.write(f"Invalid regular expression '{args.filter}'\n")
+            sys.exit(ERR_PARAMS)
+
+    return Config(args)
+
+def benchmarks(config: Config, directory: str) -> list:
+    # Name, source and input of every selected benchmark, microbenchmarks are generated to directory
+    selected = []
+    for name in MACRO:
+        source = os.path.join(ROOT, "tests", "koule", name.split("_", 1)[1], f"{name}.xml")
+        selected.append((name, source, os.devnull))
+
+    for name, workload in workloads.WORKLOADS.items():
+        if config.filter and not config.filter.search(name):
+            continue
+        source = os.path.join(directory, f"{name}.xml")
+        input = os.path.join(directory, f"{name}.in")
+        xml, input_data = workload(config.size * workloads.ITERATIONS)
+        with open(source, "w") as file:
+            file.write(xml)
+        with open(input, "w") as file:
+            file.write(input_data)
+        selected.append((name, source, input))
+
+    return [benchmark for benchmark in selected if not config.filter or config.filter.search(benchmark[0])]
+
+def run_benchmark(config: Config, name: str, source: str, input: str) -> dict:
+    # Every run is separate process, so peak RSS belongs to one run only
+    runs = []
+    for _ in range(config.repeat):
+        process = subprocess.run([sys.executable, WORKER, source, input, config.engine, "1" if config.optimize else "0"], capture_output=True, cwd=ROOT)
+        if process.returncode != 0:
+            return {"name": name, "error": f"exit code {process.returncode}: {process.stderr.decode(errors='replace').strip()}"}
+        runs.append(json.loads(process.stdout))
+
+    exec_s = min(run["exec_s"] for run in runs)
+    instructions = runs[0]["instructions"]
+    return {
+        "name": name,
+        "instructions": instructions,
+        "parse_s": min(run["parse_s"] for run in runs),
+        "exec_s": exec_s,
+        "instructions_per_s": instructions / exec_s if exec_s > 0 else 0.0,
+        "peak_rss_kb": max(run["peak_rss_kb"] for run in runs),
+    }
+
+def load_baseline(config: Config) -> dict:
+    try:
+        with open(config.baseline, "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError):
+        sys.stderr.write(f"Baseline file '{config.baseline}' could not be read\n")
+        sys.exit(ERR_FILE)
+
+def compare(config: Config, results: list, baseline: dict) -> list:
+    # Change of instructions per second against baseline, regression is slowdown over threshold
+    stored = baseline.get(config.key(), {})
+    for result in results:
+        base = stored.get(result["name"])
+        if "error" in result or base is None or not base.get("instructions_per_s"):
+            continue
+        change = 100 * (result["instructions_per_s"] / base["instructions_per_s"] - 1)
+        result["change_percent"] = change
+        result["regression"] = change < -config.threshold
+    return results
+
+def report_text(config: Config, results: list) -> str:
+    lines = [f"Benchmarks ({config.key()}, best of {config.repeat}):",
+        f"  {'name':<16}  {'instructions':>12}  {'parse ms':>10}  {'exec s':>9}  {'instr/s':>12}  {'peak RSS MB':>11}  {'change':>8}"]
+    for result in results:
+        if "error" in result:
+            lines.append(f"  {result['name']:<16}  error: {result['error']}")
+            continue
+        change = ""
+        if "change_percent" in result:
+            change = f"{result['change_percent']:+.1f}%" + (" !" if result["regression"] else "")
+        lines.append(f"  {result['name']:<16}  {result['instructions']:>12}  {result['parse_s'] * 1e3:>10.1f}  {result['exec_s']:>9.3f}"
+            f"  {result['instructions_per_s']:>12.0f}  {result['peak_rss_kb'] / 1024:>11.1f}  {change:>8}")
+    return "\n".join(lines) + "\n"
+
+if __name__ == '__main__':
+
+    # Parse script parameters
+    config = parse_params()
+
+    # Run benchmarks one by one, parallel runs would disturb measurements
+    with tempfile.TemporaryDirectory(prefix="ipp-bench-") as directory:
+        results = [run_benchmark(config, *benchmark) for benchmark in benchmarks(config, directory)]
+
+    baseline = load_baseline(config)
+    if config.save:
+        # Results of other configurations are kept in baseline
+        baseline[config.key()] = {result["name"]: result for result in results if "error" not in result}
+        try:
+            with open(config.baseline, "w") as file:
+                json.dump(baseline, file, indent=2)
+        except OSError:
+            sys.stderr.write(f"Baseline file '{config.baseline}' could not be written\n")
+            sys.exit(ERR_FILE)
+    else:
+        compare(config, results, baseline)
+
+    sys.stdout.write(report_text(config, results))
+    if config.json:
+        with open(config.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+    # Failed benchmark or regression is error
+    if any("error" in result or result.get("regression") for result in results):
+        sys.exit(ERR_REGRESSION)
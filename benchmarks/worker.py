@@ -0,0 +1,45 @@
+# IPP 2023, project 2
+# Author: Marek Gergel, xgerge01
+# File: worker.py
+# Description: Single benchmark run in own process, measurements are printed as JSON
+# Date: 2023-04-07
+
+import json,os,resource,sys,time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.python import compiler,jit,optimizer,parser,program
+
+def measure(source: str, input: str, engine: str, optimize: bool) -> dict:
+    clock = time.perf_counter
+
+    # Loading is parsing, optimization and compilation, output of program is dropped
+    start = clock()
+    prog = program.Program(input, os.devnull)
+    parser.Parser(source).parseXML(prog)
+    if optimize:
+        optimizer.Optimizer(prog).optimize()
+    if engine != "interpret":
+        compiler_i = jit.Jit(prog, optimize) if engine == "jit" else compiler.Compiler(prog, optimize)
+        compiler_i.code_get()
+        execute = compiler_i.execute
+    else:
+        execute = prog.execute
+    parse_time = clock() - start
+
+    start = clock()
+    execute()
+    exec_time = clock() - start
+
+    # Peak resident set size of process in KiB (Linux)
+    return {
+        "instructions": prog.instructions_executed(),
+        "parse_s": parse_time,
+        "exec_s": exec_time,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "exit_code": prog.get_exit_code(),
+    }
+
+if __name__ == '__main__':
+    source, input, engine, optimize = sys.argv[1:5]
+    sys.stdout.write(json.dumps(measure(source, input, engine, optimize == "1")))
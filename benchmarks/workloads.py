@@ -0,0 +1,165 @@
+# IPP 2023, project 2
+# Author: Marek Gergel, xgerge01
+# File: workloads.py
+# Description: Generated microbenchmark programs, every program stresses one opcode family
+# Date: 2023-04-07
+
+from xml.sax.saxutils import escape
+
+# Loop iterations of every microbenchmark at size 1
+ITERATIONS = 20000
+
+_FRAMES = ("GF", "LF", "TF")
+
+class Code:
+
+    def __init__(self):
+        self.instructions = []
+
+    def add(self, opcode: str, *args: str):
+        # Arguments are written as in IPPcode23 source (GF@x, int@1, label@loop, type@int)
+        self.instructions.append((opcode, args))
+
+    def loop(self, label: str, iterations: int, body):
+        # Counted loop with GF@i from 0 to iterations - 1, body adds instructions of one iteration
+        self.add("DEFVAR", "GF@i")
+        self.add("MOVE", "GF@i", "int@0")
+        self.add("LABEL", f"label@{label}")
+        body(self)
+        self.add("ADD", "GF@i", "GF@i", "int@1")
+        self.add("JUMPIFNEQ", f"label@{label}", "GF@i", f"int@{iterations}")
+
+    def xml(self) -> str:
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<program language="IPPcode23">']
+        for order, (opcode, args) in enumerate(self.instructions, 1):
+            elements = []
+            for index, arg in enumerate(args, 1):
+                prefix, value = arg.split("@", 1)
+                arg_type = "var" if prefix in _FRAMES else prefix
+                value = arg if arg_type == "var" else value
+                elements.append(f'<arg{index} type="{arg_type}">{escape(value)}</arg{index}>')
+            lines.append(f'<instruction order="{order}" opcode="{opcode}">{"".join(elements)}</instruction>')
+        lines.append("</program>")
+        return "\n".join(lines) + "\n"
+
+# --------------------------------------------
+# Workloads return program and its input
+
+def arithmetic(iterations: int) -> tuple:
+    code = Code()
+    for var in ("a", "b", "c", "x", "f"):
+        code.add("DEFVAR", f"GF@{var}")
+
+    def body(code):
+        code.add("ADD", "GF@b", "GF@i", "int@3")
+        code.add("MUL", "GF@c", "GF@b", "int@5")
+        code.add("SUB", "GF@c", "GF@c", "GF@i")
+        code.add("IDIV", "GF@c", "GF@c", "int@7")
+        code.add("LT", "GF@x", "GF@c", "GF@b")
+        code.add("EQ", "GF@x", "GF@c", "int@0")
+        code.add("INT2FLOAT", "GF@f", "GF@c")
+        code.add("DIV", "GF@f", "GF@f", "float@0x1.8p+1")
+        code.add("MUL", "GF@f", "GF@f", "GF@f")
+        code.add("FLOAT2INT", "GF@a", "GF@f")
+    code.loop("loop", iterations, body)
+    return code.xml(), ""
+
+def frames(iterations: int) -> tuple:
+    code = Code()
+    code.add("DEFVAR", "GF@x")
+
+    def body(code):
+        code.add("CREATEFRAME")
+        code.add("DEFVAR", "TF@a")
+        code.add("MOVE", "TF@a", "GF@i")
+        code.add("PUSHFRAME")
+        code.add("DEFVAR", "LF@b")
+        code.add("ADD", "LF@b", "LF@a", "int@1")
+        code.add("MOVE", "GF@x", "LF@b")
+        code.add("POPFRAME")
+    code.loop("loop", iterations, body)
+    return code.xml(), ""
+
+def calls(iterations: int) -> tuple:
+    code = Code()
+    code.add("JUMP", "label@main")
+    code.add("LABEL", "label@inc")
+    code.add("PUSHFRAME")
+    code.add("DEFVAR", "LF@r")
+    code.add("ADD", "LF@r", "LF@x", "int@1")
+    code.add("PUSHS", "LF@r")
+    code.add("POPFRAME")
+    code.add("RETURN")
+    code.add("LABEL", "label@main")
+    code.add("DEFVAR", "GF@t")
+
+    def body(code):
+        code.add("CREATEFRAME")
+        code.add("DEFVAR", "TF@x")
+        code.add("MOVE", "TF@x", "GF@i")
+        code.add("CALL", "label@inc")
+        code.add("POPS", "GF@t")
+    code.loop("loop", iterations, body)
+    return code.xml(), ""
+
+def strings(iterations: int) -> tuple:
+    code = Code()
+    for var in ("s", "t", "c", "l", "k"):
+        code.add("DEFVAR", f"GF@{var}")
+    code.add("MOVE", "GF@s", "string@")
+    code.add("MOVE", "GF@t", "string@abcdefgh")
+
+    # Long string is only appended, short string is read and changed
+    def body(code):
+        code.add("CONCAT", "GF@s", "GF@s", "string@ab")
+        code.add("STRLEN", "GF@l", "GF@t")
+        code.add("SUB", "GF@k", "GF@l", "int@1")
+        code.add("GETCHAR", "GF@c", "GF@t", "GF@k")
+        code.add("SETCHAR", "GF@t", "int@0", "GF@c")
+        code.add("STRI2INT", "GF@k", "GF@t", "int@0")
+    code.loop("loop", iterations, body)
+    code.add("STRLEN", "GF@l", "GF@s")
+    return code.xml(), ""
+
+def stack(iterations: int) -> tuple:
+    code = Code()
+    code.add("DEFVAR", "GF@x")
+
+    def body(code):
+        code.add("PUSHS", "GF@i")
+        code.add("PUSHS", "int@2")
+        code.add("MULS")
+        code.add("PUSHS", "GF@i")
+        code.add("ADDS")
+        code.add("PUSHS", "int@3")
+        code.add("IDIVS")
+        code.add("PUSHS", "GF@i")
+        code.add("LTS")
+        code.add("NOTS")
+        code.add("PUSHS", "bool@true")
+        code.add("JUMPIFNEQS", "label@skip")
+        code.add("CLEARS")
+        code.add("LABEL", "label@skip")
+    code.loop("loop", iterations, body)
+    return code.xml(), ""
+
+def io(iterations: int) -> tuple:
+    code = Code()
+    code.add("DEFVAR", "GF@v")
+
+    def body(code):
+        code.add("READ", "GF@v", "type@int")
+        code.add("WRITE", "GF@v")
+        code.add("WRITE", "string@\\010")
+    code.loop("loop", iterations, body)
+    return code.xml(), "".join(f"{value}\n" for value in range(iterations))
+
+# Microbenchmarks by name of opcode family
+WORKLOADS = {
+    "arithmetic": arithmetic,
+    "frames": frames,
+    "calls": calls,
+    "strings": strings,
+    "stack": stack,
+    "io": io,
+}
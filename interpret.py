@@ -4,21 +4,92 @@
 # Description: Interpret script for IPPcode23
 # Date: 2023-04-07
 
+import libs.python.batch as batch
+import libs.python.cache as cache
+import libs.python.cfg as cfg
+import libs.python.compiler as compiler
+import libs.python.image as image
+import libs.python.ippcode as ippcode
+import libs.python.jit as jit
+import libs.python.optimizer as optimizer
 import libs.python.params as params
 import libs.python.parser as parser
+import libs.python.profiler as profiler
 import libs.python.program as program
+import libs.python.stats as stats
 
 if __name__ == '__main__':
 
     # Parse script parameters
     params.parse()
     
-    # Parse code from xml structure
-    program_i = program.Program(params.input)
-    parser.Parser(params.source).parseXML(program_i)
+    # Parse code from xml structure or IPPcode23 source or load it from cache or bytecode image
+    program_i = program.Program(params.input, params.output)
 
-    # Execute code instructions
-    program_i.execute()
+    def parse(source):
+        if params.source_format == 'ippcode':
+            ippcode.Parser(source).parseCode(program_i)
+        else:
+            parser.Parser(source).parseXML(program_i)
+
+    # Profile, statistics and traces need all instructions, otherwise instructions of image are decoded at first execution
+    image_lazy = params.profile is None and not params.stats and params.engine != 'jit'
+    if params.image is not None:
+        image.Image(params.image).load(program_i, image_lazy, params.optimize)
+    elif params.cache_dir is not None:
+        cache_i = cache.Cache(params.cache_dir, params.source, params.source_format)
+        if not cache_i.load(program_i):
+            parse(cache_i.source)
+            cache_i.store(program_i)
+    else:
+        parse(params.source)
+
+    if params.image_out is not None:
+        image.write(program_i, params.image_out)
+
+    if params.compile_only:
+        exit(0)
+
+    # Fuse instruction sequences, cache and image keep program without optimization (lazy image fuses them itself)
+    # Control flow is simplified only when executed instructions are not counted by profile or statistics
+    # Profile reports every original instruction, so sequences are not fused with it
+    optimize = params.optimize and not (params.image is not None and image_lazy)
+    if optimize and params.profile is None:
+        if not params.stats:
+            cfg.Simplifier(program_i).simplify()
+        optimizer.Optimizer(program_i).optimize()
+
+    # Initialized variables are counted only for statistics
+    if any(action == 'vars' for path, actions in params.stats for action, value in actions):
+        program_i.vars_tracking_enable()
+
+    # Execute code instructions, statistics use counts of profiler, compiled code leaves out checks proven by type inference
+    # Traces count executed instructions by loop iterations, so profile and statistics use compiled code without them
+    compiler_i = None
+    if params.engine == 'jit' and params.profile is None and not params.stats:
+        compiler_i = jit.Jit(program_i, optimize)
+    elif params.engine != 'interpret':
+        compiler_i = compiler.Compiler(program_i, optimize)
+    profiler_i = None
+    if params.profile is not None or params.stats:
+        profiler_i = profiler.Profiler(program_i, params.profile, compiler_i)
+        execute = profiler_i.execute
+    elif compiler_i is not None:
+        execute = compiler_i.execute
+    else:
+        execute = program_i.execute
+
+    # Execute code with every batch input, program is parsed only once
+    if params.batch is not None:
+        batch_i = batch.Batch(program_i, execute, params.batch_output)
+        batch_i.run(batch_i.inputs(params.batch))
+        exit(0)
+
+    execute()
+
+    # Write statistics after successful interpretation
+    if params.stats:
+        stats.Stats(program_i, params.stats).write(profiler_i.counts)
 
     # Exit with program exit code
     exit(program_i.get_exit_code())
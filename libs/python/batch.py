@@ -0,0 +1,67 @@
+# IPP 2023, project 2
+# Author: Marek Gergel, xgerge01
+# File: batch.py
+# Description: Execution of one program with many input files
+# Date: 2023-04-07
+
+from . import error,program
+import collections,os
+
+class Batch:
+
+    def __init__(self, prog: program.Program, execute, output_dir: str):
+        self.prog = prog
+        self.execute = execute
+        self.output_dir = output_dir
+
+    def inputs(self, path: str) -> list:
+        # Directory with '*.in' files or manifest with one input file per line
+        if os.path.isdir(path):
+            return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".in"))
+
+        try:
+            with open(path, "r") as manifest:
+                return [line.strip() for line in manifest if line.strip()]
+        except OSError:
+            error.exit(error.code.ERR_INPUT, f"Batch manifest '{path}' does not exist or could not be read\n")
+
+    def run(self, inputs: list):
+        # Outputs are named by input files, inputs with same name would overwrite outputs of each other
+        names = collections.Counter(os.path.splitext(os.path.basename(input))[0] for input in inputs)
+        duplicate = next((name for name, count in names.items() if count > 1), None)
+        if duplicate is not None:
+            error.exit(error.code.ERR_PARAMS, f"Batch inputs have same name '{duplicate}', their outputs would be overwritten\n")
+
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+        except OSError:
+            error.exit(error.code.ERR_OUTPUT, f"Batch output directory '{self.output_dir}' could not be created\n")
+
+        for input in inputs:
+            name = os.path.splitext(os.path.basename(input))[0]
+            exit_code = self._run_one(input, os.path.join(self.output_dir, f"{name}.out"))
+
+            try:
+                with open(os.path.join(self.output_dir, f"{name}.rc"), "w") as rc_file:
+                    rc_file.write(f"{exit_code}")
+            except OSError:
+                error.exit(error.code.ERR_OUTPUT, f"Batch output for '{input}' could not be written\n")
+
+    def _run_one(self, input: str, output: str) -> int:
+        try:
+            output_file = open(output, "w")
+        except OSError:
+            error.exit(error.code.ERR_OUTPUT, f"Batch output '{output}' could not be written\n")
+
+        # Errors exit the run, not the whole batch
+        with output_file:
+            try:
+                self.prog.reset(input, output_file)
+                self.execute()
+            except SystemExit as exception:
+                return exception.code
+            finally:
+                self.prog.input_close_file()
+                self.prog.output_close_file()
+
+        return self.prog.get_exit_code()
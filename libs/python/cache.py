@@ -0,0 +1,100 @@
+# IPP 2023, project 2
+# Author: Marek Gergel, xgerge01
+# File: cache.py
+# Description: Cache of validated and linked programs
+# Date: 2023-04-07
+
+from . import error,instruction,program
+import hashlib,io,marshal,os
+
+# Cache file format version, part of hash so old files are never loaded
+_VERSION = b"IPPcode23-cache-4"
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ippcode23")
+
+# Tags of argument types in serialized programs (cache files and bytecode images)
+TYPE_TAGS = {
+    program.Program.DataType.VAR: "var",
+    int: "int",
+    bool: "bool",
+    str: "string",
+    float: "float",
+    program.Program.DataType.NIL: "nil",
+    None: None,
+}
+TAG_TYPES = {tag: type for type, tag in TYPE_TAGS.items()}
+
+class Cache:
+
+    source = None
+
+    def __init__(self, directory, source, source_format: str = "xml"):
+
+        self.directory = directory
+
+        # Read whole source, hash of format and content is key of cache file
+        try:
+            if hasattr(source, "read"):
+                data = source.buffer.read() if hasattr(source, "buffer") else source.read()
+            else:
+                with open(source, "rb") as source_file:
+                    data = source_file.read()
+        except:
+            error.exit(error.code.ERR_INPUT, f"Source file '{source}' does not exist or could not be read\n")
+
+        if isinstance(data, str):
+            data = data.encode()
+
+        self.source = io.BytesIO(data)
+        self.path = os.path.join(self.directory, hashlib.sha256(_VERSION + source_format.encode() + data).hexdigest() + ".bin")
+
+    def load(self, prog: program.Program) -> bool:
+        # Load instructions and labels of program, False if cache file does not exist or is not valid
+        try:
+            with open(self.path, "rb") as cache_file:
+                labels, instructions = marshal.loads(cache_file.read())
+            instructions = [self._decode_instruction(*data) for data in instructions]
+        except:
+            return False
+
+        for instruction_in in instructions:
+            prog.instruction_add(instruction_in)
+        for label, index in labels:
+            prog.label_create(label, index)
+        return True
+
+    def store(self, prog: program.Program):
+        data = [(label, index) for label, index in prog._labels.items()], \
+            [self._encode_instruction(instruction_in) for instruction_in in prog._instructions]
+
+        # Write to temporary file first, so cache file is never incomplete
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path_tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(path_tmp, "wb") as cache_file:
+                cache_file.write(marshal.dumps(data))
+            os.replace(path_tmp, self.path)
+        except OSError:
+            error.print(f"Cache file '{self.path}' could not be written\n")
+
+    def _encode_instruction(self, instruction_in) -> tuple:
+        args = []
+        for index in range(len(instruction_in.args)):
+            arg_type, value = instruction_in.args[index]
+            if arg_type == program.Program.DataType.VAR:
+                value = value.frame, value.name
+            args.append((TYPE_TAGS[arg_type], value))
+        return type(instruction_in).__name__, instruction_in.opcode, args, instruction_in.order
+
+    def _decode_instruction(self, name, opcode, args, order) -> instruction.Instruction:
+        args_decoded = {}
+        for index, (tag, value) in enumerate(args):
+            arg_type = TAG_TYPES[tag]
+            if arg_type == program.Program.DataType.VAR:
+                value = program.Program.Variable(*value)
+            args_decoded[index] = arg_type, value
+
+        instruction_class = getattr(instruction, name)
+        if not issubclass(instruction_class, instruction.Instruction):
+            raise TypeError(name)
+        return instruction_class(opcode, args_decoded, order)
@@ -0,0 +1,195 @@
+# IPP 2023, project 2
+# Author: Marek Gergel, xgerge01
+# File: cfg.py
+# Description: Control flow graph of linked code instructions split to basic blocks and its simplification
+# Date: 2023-04-07
+
+from . import instruction,program
+
+# Instructions with label index as first argument, conditional jumps also continue with next instruction
+_JUMPS = (instruction.JUMP, instruction.CALL)
+_CONDITIONAL_JUMPS = (instruction.JUMPIFEQ, instruction.JUMPIFNEQ)
+
+# Instructions which never continue with next instruction
+_TERMINATORS = (instruction.JUMP, instruction.RETURN, instruction.EXIT)
+
+class Block:
+
+    def __init__(self, number: int, start: int, end: int):
+        # Instructions from start to end (exclusive), successors and predecessors are blocks
+        self.number = number
+        self.start = start
+        self.end = end
+        self.successors = []
+        self.predecessors = []
+
+class Graph:
+
+    def __init__(self, instructions: list):
+        self.instructions = instructions
+        count = len(instructions)
+
+        # Return goes to instruction after any call (calls are not matched with returns)
+        self.returns = [index + 1 for index, instruction_in in enumerate(instructions)
+            if isinstance(instruction_in, instruction.CALL) and index + 1 < count]
+
+        # Block starts on first instruction, jump target and instruction after jump, call, return or exit
+        leaders = {0} if count else set()
+        for index, instruction_in in enumerate(instructions):
+            successors = self.successors(index)
+            if successors != [index + 1]:
+                leaders.update(successors)
+                leaders.add(index + 1)
+        starts = sorted(leader for leader in leaders if leader < count)
+
+        self.blocks = [Block(number, start, end) for number, (start, end) in enumerate(zip(starts, starts[1:] + [count]))]
+        self.block_index = [0] * count
+        for block in self.blocks:
+            for index in range(block.start, block.end):
+                self.block_index[index] = block.number
+
+        for block in self.blocks:
+            for successor in dict.fromkeys(self.successors(block.end - 1)):
+                if successor < count:
+                    block.successors.append(self.blocks[self.block_index[successor]])
+            for successor in block.successors:
+                successor.predecessors.append(block)
+
+    def successors(self, index: int) -> list:
+        # Indexes of instructions which can be executed after instruction on index (count is end of program)
+        instruction_in = self.instructions[index]
+        if isinstance(instruction_in, _JUMPS):
+            return [instruction_in.args[0][1]]
+        if isinstance(instruction_in, _CONDITIONAL_JUMPS):
+            return [instruction_in.args[0][1], index + 1]
+        if isinstance(instruction_in, instruction.RETURN):
+            return self.returns
+        if isinstance(instruction_in, instruction.EXIT):
+            return []
+        return [index + 1]
+
+    def block_of(self, index: int) -> Block:
+        return self.blocks[self.block_index[index]]
+
+    def reachable(self) -> set:
+        # Numbers of blocks reachable from first instruction, return goes only to instruction after reachable call
+        count = len(self.instructions)
+        reached = set()
+        returns = []
+        returned = False
+        pending = [0] if self.blocks else []
+        while pending:
+            number = pending.pop()
+            if number in reached:
+                continue
+            reached.add(number)
+
+            index = self.blocks[number].end - 1
+            instruction_in = self.instructions[index]
+            if isinstance(instruction_in, instruction.RETURN):
+                returned = True
+                successors = returns
+            else:
+                successors = self.successors(index)
+                if isinstance(instruction_in, instruction.CALL) and index + 1 < count:
+                    returns.append(index + 1)
+                    if returned:
+                        successors = successors + [index + 1]
+            pending.extend(self.block_index[successor] for successor in successors if successor < count)
+        return reached
+
+# --------------------------------------------
+# Simplification of linked program, executed instructions are not same (statistics count original program),
+# but output, exit code and errors are
+
+class Simplifier:
+
+    def __init__(self, prog: program.Program):
+        self.prog = prog
+
+    def simplify(self):
+        prog = self.prog
+        instructions = prog._instructions
+        if not instructions:
+            return
+
+        # Jump to chain of unconditional jumps goes to label of last jump
+        instructions = [self._retarget(instruction_in, self._thread(instructions, instruction_in.args[0][1]))
+            if isinstance(instruction_in, _JUMPS + _CONDITIONAL_JUMPS) else instruction_in for instruction_in in instructions]
+
+        # Unreachable blocks are dropped, labels which are not targeted and jumps to next instruction of new layout
+        # are dropped until nothing changes (dropped jump can leave its label without target)
+        graph = Graph(instructions)
+        layout = self._layout(graph, graph.reachable())
+        while True:
+            targets = {instructions[index].args[0][1] for index in layout if isinstance(instructions[index], _JUMPS + _CONDITIONAL_JUMPS)}
+            kept = [index for index in layout if index in targets or not isinstance(instructions[index], instruction.LABEL)]
+            kept = [index for position, index in enumerate(kept)
+                if type(instructions[index]) is not instruction.JUMP or kept[position + 1:position + 2] != [instructions[index].args[0][1]]]
+            if len(kept) == len(layout):
+                break
+            layout = kept
+
+        # Targets are always kept labels
+        indexes = {index: new_index for new_index, index in enumerate(layout)}
+        prog._instructions = [self._retarget(instructions[index], indexes[instructions[index].args[0][1]])
+            if isinstance(instructions[index], _JUMPS + _CONDITIONAL_JUMPS) else instructions[index] for index in layout]
+        prog._labels = {label: indexes[index] for label, index in prog._labels.items() if index in indexes}
+
+    def _thread(self, instructions: list, index: int) -> int:
+        # Label index of last jump of chain, cycle of jumps ends on first repeated label
+        visited = set()
+        while index not in visited:
+            visited.add(index)
+            next_index = index
+            while next_index < len(instructions) and isinstance(instructions[next_index], instruction.LABEL):
+                next_index += 1
+            if next_index == len(instructions) or type(instructions[next_index]) is not instruction.JUMP:
+                break
+            index = instructions[next_index].args[0][1]
+        return index
+
+    def _retarget(self, instruction_in, index: int):
+        # Copy of jump with other target, instructions of parser (cache) are not changed
+        if instruction_in.args[0][1] == index:
+            return instruction_in
+        args = dict(instruction_in.args)
+        args[0] = args[0][0], index
+        return type(instruction_in)(instruction_in.opcode, args, instruction_in.order)
+
+    def _layout(self, graph: Graph, reached: set) -> list:
+        # Reached blocks are joined to chains of blocks which continue with next block (after call returns to it)
+        count = len(graph.instructions)
+        chains = []
+        for block in graph.blocks:
+            if block.number not in reached:
+                continue
+            if chains and chains[-1][-1].end == block.start and not isinstance(graph.instructions[block.start - 1], _TERMINATORS):
+                chains[-1].append(block)
+            else:
+                chains.append([block])
+        heads = {chain[0].start: chain for chain in chains}
+
+        # Chain which continues to end of program has to stay last
+        last = chains[-1]
+        if last[-1].end != count or isinstance(graph.instructions[count - 1], _TERMINATORS):
+            last = None
+
+        # First chain starts program, chain ending with jump is followed by chain of its target if it is not placed yet
+        layout = []
+        placed = set()
+        remaining = iter(chains)
+        chain = chains[0]
+        while chain is not None:
+            placed.add(chain[0].start)
+            layout.extend(index for block in chain for index in range(block.start, block.end))
+
+            jump = graph.instructions[chain[-1].end - 1]
+            target = heads.get(jump.args[0][1]) if type(jump) is instruction.JUMP else None
+            if target is not None and target[0].start not in placed and (target is not last or len(placed) == len(chains) - 1):
+                chain = target
+            else:
+                chain = next((chain for chain in remaining if chain[0].start not in placed and chain is not last), None)
+                if chain is None and last is not None and last[0].start not in placed:
+                    chain = last
+        return layout
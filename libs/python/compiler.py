@@ -0,0 +1,986 @@
+# IPP 2023, project 2
+# Author: Marek Gergel, xgerge01
+# File: compiler.py
+# Description: Compilation of code instructions to closures
+# Date: 2023-04-07
+
+from . import error,inference,instruction,program
+import operator,sys
+
+_VAR = program.Program.DataType.VAR
+_UNDEFINED = program.UNDEFINED
+_UNINITIALIZED = program.UNINITIALIZED
+_BUILDER = program.StringBuilder
+
+# Types of values which can be compared without type check when both operands have the same one
+_COMPARABLE = (inference.INT, inference.BOOL, inference.STRING, inference.FLOAT)
+
+# Raised by closure which needs synchronized program state (BREAK, recording of trace)
+class _Sync(Exception):
+
+    def __init__(self, index, action):
+        self.index = index
+        self.action = action
+
+# Raised by shared closure of instructions not decoded from bytecode image yet
+class _Pending(Exception):
+    pass
+
+def _pending():
+    raise _Pending
+
+class Compiler:
+
+    code = None
+    inference = None
+
+    def __init__(self, prog: program.Program, infer: bool = False):
+        self.prog = prog
+        self.infer = infer
+        self.index = None
+
+    def compile(self) -> list:
+        # Checks proven by inference are left out of closures, instructions elsewhere keep them
+        if self.infer:
+            self.inference = inference.Inference(self.prog)
+
+        # Lower every instruction to closure returning index of next instruction
+        return [self._compile_instruction(index, instruction_in) for index, instruction_in in enumerate(self.prog._instructions)]
+
+    def code_get(self) -> list:
+        # Program is compiled once, closures read program state when they are called
+        if self.code is None:
+            self.code = self.compile()
+        return self.code
+
+    def execute(self):
+        prog = self.prog
+        code = self.code_get()
+        count = len(code)
+        index = prog.instruction_counter_get()
+        executed = prog._instructions_executed
+
+        try:
+            while True:
+                try:
+                    while index < count:
+                        executed += 1
+                        index = code[index]()
+                    break
+                except _Sync as sync:
+                    prog._instruction_next_index = sync.index + 1
+                    prog._instructions_executed = executed
+                    index = sync.action()
+                    executed = prog._instructions_executed
+                except _Pending:
+                    # Instruction is compiled at its first execution and executed again
+                    executed -= 1
+                    code[index] = self._compile_instruction(index, prog._instructions[index].decode(prog, index))
+        finally:
+            prog._instruction_next_index = index
+            prog._instructions_executed = executed
+            prog.output_flush()
+
+    def _compile_instruction(self, index, instruction_in):
+        # Facts of inference are looked up for index of compiled instruction
+        self.index = index
+        compile_method = getattr(self, f"_compile_{type(instruction_in).__name__}", None)
+        if compile_method is None:
+            return self._compile_generic(index, instruction_in)
+        return compile_method(index, instruction_in, instruction_in.args)
+
+    def _compile_Pending(self, index, instruction_in, args):
+        # Instructions of bytecode image share one closure until they are executed
+        return _pending
+
+    def _compile_generic(self, index, instruction_in):
+        prog = self.prog
+
+        # Fallback to instruction execute method
+        def op():
+            prog._instruction_next_index = index
+            instruction_in.execute(prog)
+            return prog._instruction_next_index
+        return op
+
+    # --------------------------------------------
+    # Operands
+
+    def _mask(self, var) -> int:
+        # Possible states of variable before compiled instruction
+        if self.inference is None:
+            return inference.ALL
+        return self.inference.mask(self.index, var)
+
+    def _operand_types(self, args) -> tuple:
+        # Possible types of symbols after destination or label, empty for stack form
+        if self.inference is None:
+            return ()
+        return tuple(self.inference.symbol_mask(self.index, args[arg]) for arg in range(1, len(args)))
+
+    def _same_type(self, args, types=_COMPARABLE) -> bool:
+        # Both operands have proven the same type of types
+        operand_types = self._operand_types(args)
+        return len(operand_types) == 2 and operand_types[0] == operand_types[1] and operand_types[0] in types
+
+    def _symbol(self, symb, must=True):
+        # Constant is already decoded by parser
+        if symb[0] != _VAR:
+            value = symb[1]
+            return lambda: value
+        return self._variable_get(symb[1], must)
+
+    def _variable_get(self, var, must=True):
+        prog = self.prog
+        slot = var.slot
+
+        # Global variable proven defined (and initialized) is read without checks, string can be in builder
+        mask = self._mask(var)
+        if var.frame == program.Program._Frame.GF and not mask & (inference.UNDEFINED | (inference.UNINITIALIZED if must else 0)):
+            if not mask & inference.STRING:
+                return lambda: prog._frame_global[slot]
+
+            def get():
+                value = prog._frame_global[slot]
+                if type(value) is _BUILDER:
+                    return value.materialize()
+                return value
+            return get
+
+        match var.frame:
+            case program.Program._Frame.GF:
+                def get():
+                    value = prog._frame_global[slot]
+                    if value is _UNDEFINED:
+                        error.exit(error.code.ERR_CODE_VARIABLE, "Variable is not defined\n")
+                    if must and value is _UNINITIALIZED:
+                        error.exit(error.code.ERR_CODE_VALUE, f"Variable is not initialized\n")
+                    if type(value) is _BUILDER:
+                        return value.materialize()
+                    return value
+            case program.Program._Frame.LF:
+                def get():
+                    frame = prog._frame_local
+                    if frame is None:
+                        error.exit(error.code.ERR_CODE_FRAME, "Local frame is not defined\n")
+                    value = frame[slot]
+                    if value is _UNDEFINED:
+                        error.exit(error.code.ERR_CODE_VARIABLE, "Variable is not defined\n")
+                    if must and value is _UNINITIALIZED:
+                        error.exit(error.code.ERR_CODE_VALUE, f"Variable is not initialized\n")
+                    if type(value) is _BUILDER:
+                        return value.materialize()
+                    return value
+            case program.Program._Frame.TF:
+                def get():
+                    frame = prog._frame_temp
+                    if frame is None:
+                        error.exit(error.code.ERR_CODE_FRAME, "Temporary frame is not defined\n")
+                    value = frame[slot]
+                    if value is _UNDEFINED:
+                        error.exit(error.code.ERR_CODE_VARIABLE, "Variable is not defined\n")
+                    if must and value is _UNINITIALIZED:
+                        error.exit(error.code.ERR_CODE_VALUE, f"Variable is not initialized\n")
+                    if type(value) is _BUILDER:
+                        return value.materialize()
+                    return value
+        return get
+
+    def _variable_set(self, var):
+        prog = self.prog
+        slot = var.slot
+
+        # Initialized variables are counted by program
+        if prog._vars_tracking:
+            var_set = prog.var_set
+
+            def store(value):
+                var_set(var, value)
+            return store
+
+        # Global variable proven defined is set without check
+        if var.frame == program.Program._Frame.GF and not self._mask(var) & inference.UNDEFINED:
+            def store(value):
+                prog._frame_global[slot] = value
+            return store
+
+        match var.frame:
+            case program.Program._Frame.GF:
+                def store(value):
+                    frame = prog._frame_global
+                    if frame[slot] is _UNDEFINED:
+                        error.exit(error.code.ERR_CODE_VARIABLE, "Variable is not defined\n")
+                    frame[slot] = value
+            case program.Program._Frame.LF:
+                def store(value):
+                    frame = prog._frame_local
+                    if frame is None:
+                        error.exit(error.code.ERR_CODE_FRAME, "Local frame is not defined\n")
+                    if frame[slot] is _UNDEFINED:
+                        error.exit(error.code.ERR_CODE_VARIABLE, "Variable is not defined\n")
+                    frame[slot] = value
+            case program.Program._Frame.TF:
+                def store(value):
+                    frame = prog._frame_temp
+                    if frame is None:
+                        error.exit(error.code.ERR_CODE_FRAME, "Temporary frame is not defined\n")
+                    if frame[slot] is _UNDEFINED:
+                        error.exit(error.code.ERR_CODE_VARIABLE, "Variable is not defined\n")
+                    frame[slot] = value
+        return store
+
+    # --------------------------------------------
+    # Frames, calls and data stack
+
+    def _compile_MOVE(self, index, instruction_in, args):
+        get = self._symbol(args[1])
+        store = self._variable_set(args[0][1])
+        next_index = index + 1
+
+        def op():
+            store(get())
+            return next_index
+        return op
+
+    def _compile_CREATEFRAME(self, index, instruction_in, args):
+        prog = self.prog
+        frame_create = prog.frame_create
+        next_index = index + 1
+
+        # Initialized variables are counted by program
+        if prog._vars_tracking:
+            def op():
+                frame_create()
+                return next_index
+            return op
+
+        empty = [_UNDEFINED] * len(prog._slots_local)
+
+        def op():
+            prog._frame_temp = empty.copy()
+            return next_index
+        return op
+
+    def _frame_push(self):
+        prog = self.prog
+
+        def frame_push():
+            frame = prog._frame_temp
+            if frame is None:
+                error.exit(error.code.ERR_CODE_FRAME, "Temp frame is not defined\n")
+            if prog._frame_local is not None:
+                prog._frame_stack.append(prog._frame_local)
+            prog._frame_local = frame
+            prog._frame_temp = None
+        return frame_push
+
+    def _frame_pop(self):
+        prog = self.prog
+
+        # Initialized variables are counted by program
+        if prog._vars_tracking:
+            return prog.frame_pop
+
+        def frame_pop():
+            frame = prog._frame_local
+            if frame is None:
+                error.exit(error.code.ERR_CODE_FRAME, "Local frame is not defined\n")
+            prog._frame_temp = frame
+            frames = prog._frame_stack
+            prog._frame_local = frames.pop() if frames else None
+        return frame_pop
+
+    def _compile_PUSHFRAME(self, index, instruction_in, args):
+        frame_push = self._frame_push()
+        next_index = index + 1
+
+        def op():
+            frame_push()
+            return next_index
+        return op
+
+    def _compile_POPFRAME(self, index, instruction_in, args):
+        frame_pop = self._frame_pop()
+        next_index = index + 1
+
+        def op():
+            frame_pop()
+            return next_index
+        return op
+
+    def _compile_DEFVAR(self, index, instruction_in, args):
+        prog = self.prog
+        slot = args[0][1].slot
+        next_index = index + 1
+
+        match args[0][1].frame:
+            case program.Program._Frame.GF:
+                def op():
+                    frame = prog._frame_global
+                    if frame[slot] is not _UNDEFINED:
+                        error.exit(error.code.ERR_XML_SEMANTIC, "Variable is already defined\n")
+                    frame[slot] = _UNINITIALIZED
+                    return next_index
+            case program.Program._Frame.LF:
+                def op():
+                    frame = prog._frame_local
+                    if frame is None:
+                        error.exit(error.code.ERR_CODE_FRAME, "Local frame is not defined\n")
+                    if frame[slot] is not _UNDEFINED:
+                        error.exit(error.code.ERR_XML_SEMANTIC, "Variable is already defined\n")
+                    frame[slot] = _UNINITIALIZED
+                    return next_index
+            case program.Program._Frame.TF:
+                def op():
+                    frame = prog._frame_temp
+                    if frame is None:
+                        error.exit(error.code.ERR_CODE_FRAME, "Temporary frame is not defined\n")
+                    if frame[slot] is not _UNDEFINED:
+                        error.exit(error.code.ERR_XML_SEMANTIC, "Variable is already defined\n")
+                    frame[slot] = _UNINITIALIZED
+                    return next_index
+        return op
+
+    def _compile_CALL(self, index, instruction_in, args):
+        prog = self.prog
+        label_index = args[0][1]
+        next_index = index + 1
+
+        def op():
+            prog._call_stack.append(next_index)
+            return label_index
+        return op
+
+    def _compile_RETURN(self, index, instruction_in, args):
+        call_stack_pop = self.prog.call_stack_pop
+        return call_stack_pop
+
+    # Data stack and its storage are never replaced, closures work with stack pointer directly
+
+    def _compile_PUSHS(self, index, instruction_in, args):
+        stack = self.prog._data_stack
+        items = stack.items
+        next_index = index + 1
+
+        # Constant is pushed without getter
+        if args[0][0] != _VAR:
+            value = args[0][1]
+
+            def op():
+                top = stack.top
+                if top == len(items):
+                    stack.grow()
+                items[top] = value
+                stack.top = top + 1
+                return next_index
+            return op
+
+        get = self._variable_get(args[0][1])
+
+        def op():
+            top = stack.top
+            if top == len(items):
+                stack.grow()
+            items[top] = get()
+            stack.top = top + 1
+            return next_index
+        return op
+
+    def _compile_POPS(self, index, instruction_in, args):
+        stack = self.prog._data_stack
+        items = stack.items
+        store = self._variable_set(args[0][1])
+        next_index = index + 1
+
+        def op():
+            top = stack.top - 1
+            if top < 0:
+                error.exit(error.code.ERR_CODE_VALUE, "Data stack is empty\n")
+            stack.top = top
+            store(items[top])
+            return next_index
+        return op
+
+    def _compile_CLEARS(self, index, instruction_in, args):
+        stack = self.prog._data_stack
+        next_index = index + 1
+
+        def op():
+            stack.top = 0
+            return next_index
+        return op
+
+    # --------------------------------------------
+    # Arithmetic, relational, boolean and conversion instructions
+
+    def _binary(self, index, instruction_in, args, operation):
+        # Build closure for stack or 3-address form of binary operation
+        next_index = index + 1
+
+        if len(args) == 0:
+            stack = self.prog._data_stack
+            items = stack.items
+
+            # Two operands are replaced by result on top of stack
+            def op():
+                top = stack.top - 1
+                if top < 1:
+                    error.exit(error.code.ERR_CODE_VALUE, "Data stack is empty\n")
+                items[top - 1] = operation(items[top - 1], items[top])
+                stack.top = top
+                return next_index
+        else:
+            store = self._variable_set(args[0][1])
+            get1 = self._symbol(args[1])
+            get2 = self._symbol(args[2])
+
+            def op():
+                store(operation(get1(), get2()))
+                return next_index
+        return op
+
+    def _unary(self, index, instruction_in, args, operation):
+        # Build closure for stack or 2-address form of unary operation
+        next_index = index + 1
+
+        if len(args) == 0:
+            stack = self.prog._data_stack
+            items = stack.items
+
+            # Operand is replaced by result on top of stack
+            def op():
+                top = stack.top - 1
+                if top < 0:
+                    error.exit(error.code.ERR_CODE_VALUE, "Data stack is empty\n")
+                items[top] = operation(items[top])
+                return next_index
+        else:
+            store = self._variable_set(args[0][1])
+            get = self._symbol(args[1])
+
+            def op():
+                store(operation(get()))
+                return next_index
+        return op
+
+    def _compile_ADD(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+        if self._same_type(args, (inference.INT, inference.FLOAT)):
+            return self._binary(index, instruction_in, args, operator.add)
+
+        def operation(value1, value2):
+            value_type = type(value1)
+            if (value_type is not int and value_type is not float) or type(value2) is not value_type:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires both arguments INT or FLOAT type\n")
+            return value1 + value2
+        return self._binary(index, instruction_in, args, operation)
+
+    def _compile_SUB(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+        if self._same_type(args, (inference.INT, inference.FLOAT)):
+            return self._binary(index, instruction_in, args, operator.sub)
+
+        def operation(value1, value2):
+            value_type = type(value1)
+            if (value_type is not int and value_type is not float) or type(value2) is not value_type:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires both arguments INT or FLOAT type\n")
+            return value1 - value2
+        return self._binary(index, instruction_in, args, operation)
+
+    def _compile_MUL(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+        if self._same_type(args, (inference.INT, inference.FLOAT)):
+            return self._binary(index, instruction_in, args, operator.mul)
+
+        def operation(value1, value2):
+            value_type = type(value1)
+            if (value_type is not int and value_type is not float) or type(value2) is not value_type:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires both arguments INT or FLOAT type\n")
+            return value1 * value2
+        return self._binary(index, instruction_in, args, operation)
+
+    def _compile_DIV(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+
+        def operation(value1, value2):
+            if type(value1) is not float or type(value2) is not float:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires both arguments FLOAT type\n")
+            if value2 == 0:
+                error.exit(error.code.ERR_CODE_ZERO, f"Operation '{opcode}' cannot divide by zero\n")
+            return value1 / value2
+        return self._binary(index, instruction_in, args, operation)
+
+    def _compile_IDIV(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+
+        def operation(value1, value2):
+            if type(value1) is not int or type(value2) is not int:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires both arguments INT type\n")
+            if value2 == 0:
+                error.exit(error.code.ERR_CODE_ZERO, f"Operation '{opcode}' cannot divide by zero\n")
+            return value1 // value2
+        return self._binary(index, instruction_in, args, operation)
+
+    def _compile_LT(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+        if self._same_type(args):
+            return self._binary(index, instruction_in, args, operator.lt)
+
+        def operation(value1, value2):
+            if type(value1) is not type(value2) or value1 is None:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires both arguments same type (INT, FLOAT, STRING, BOOL) \n")
+            return value1 < value2
+        return self._binary(index, instruction_in, args, operation)
+
+    def _compile_GT(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+        if self._same_type(args):
+            return self._binary(index, instruction_in, args, operator.gt)
+
+        def operation(value1, value2):
+            if type(value1) is not type(value2) or value1 is None:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires both arguments same type (INT, FLOAT, STRING, BOOL) \n")
+            return value1 > value2
+        return self._binary(index, instruction_in, args, operation)
+
+    def _compile_EQ(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+        if self._same_type(args, _COMPARABLE + (inference.NIL,)):
+            return self._binary(index, instruction_in, args, operator.eq)
+
+        def operation(value1, value2):
+            if type(value1) is not type(value2) and value1 is not None and value2 is not None:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires both arguments same type (INT, FLOAT, STRING, BOOL) or NIL \n")
+            return type(value1) is type(value2) and value1 == value2
+        return self._binary(index, instruction_in, args, operation)
+
+    def _compile_AND(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+        if self._same_type(args, (inference.BOOL,)):
+            return self._binary(index, instruction_in, args, operator.and_)
+
+        def operation(value1, value2):
+            if type(value1) is not bool or type(value2) is not bool:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires both arguments BOOL type\n")
+            return value1 and value2
+        return self._binary(index, instruction_in, args, operation)
+
+    def _compile_OR(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+        if self._same_type(args, (inference.BOOL,)):
+            return self._binary(index, instruction_in, args, operator.or_)
+
+        def operation(value1, value2):
+            if type(value1) is not bool or type(value2) is not bool:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires both arguments BOOL type\n")
+            return value1 or value2
+        return self._binary(index, instruction_in, args, operation)
+
+    def _compile_NOT(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+        if self._operand_types(args) == (inference.BOOL,):
+            return self._unary(index, instruction_in, args, operator.not_)
+
+        def operation(value):
+            if type(value) is not bool:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires both arguments BOOL type\n")
+            return not value
+        return self._unary(index, instruction_in, args, operation)
+
+    def _compile_INT2CHAR(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+
+        def operation(value):
+            if type(value) is not int:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires argument INT type\n")
+            try:
+                return chr(value)
+            except (ValueError, OverflowError):
+                error.exit(error.code.ERR_CODE_STRING, f"Operation '{opcode}' requires argument INT with unicode valid value\n")
+        return self._unary(index, instruction_in, args, operation)
+
+    def _compile_STRI2INT(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+
+        def operation(value1, value2):
+            if type(value1) is not str or type(value2) is not int:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires arguments STRING and INT type\n")
+            if value2 < 0 or value2 >= len(value1):
+                error.exit(error.code.ERR_CODE_STRING, f"Index out of range, must be in range 0..{len(value1) - 1}\n")
+            return ord(value1[value2])
+        return self._binary(index, instruction_in, args, operation)
+
+    def _compile_INT2FLOAT(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+
+        def operation(value):
+            if type(value) is not int:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires argument INT type\n")
+            try:
+                return float(value)
+            except OverflowError:
+                error.exit(error.code.ERR_CODE_ZERO, f"Operation '{opcode}' requires argument INT in FLOAT range\n")
+        return self._unary(index, instruction_in, args, operation)
+
+    def _compile_FLOAT2INT(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+
+        def operation(value):
+            if type(value) is not float:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires argument FLOAT type\n")
+            try:
+                return int(value)
+            except (ValueError, OverflowError):
+                error.exit(error.code.ERR_CODE_ZERO, f"Operation '{opcode}' requires finite FLOAT value\n")
+        return self._unary(index, instruction_in, args, operation)
+
+    # --------------------------------------------
+    # Input and output
+
+    def _compile_READ(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+        input_read = self.prog.input_read
+        store = self._variable_set(args[0][1])
+        read_type = {
+            program.Program.DataType.INT: int,
+            program.Program.DataType.STRING: str,
+            program.Program.DataType.BOOL: bool,
+            program.Program.DataType.FLOAT: float,
+        }.get(args[1][1])
+        next_index = index + 1
+
+        def op():
+            if read_type is None:
+                error.exit(error.code.ERR_XML_SEMANTIC, f"Operation '{opcode}' requires argument INT, FLOAT, STRING or BOOL type\n")
+            store(input_read(read_type))
+            return next_index
+        return op
+
+    def _compile_WRITE(self, index, instruction_in, args):
+        next_index = index + 1
+        text = instruction.value_str
+
+        # Constant text is prepared at compile time
+        output_write = self.prog.output_write
+        if args[0][0] != _VAR:
+            value = text(args[0][1])
+
+            def op():
+                output_write(value)
+                return next_index
+        else:
+            get = self._symbol(args[0])
+
+            def op():
+                output_write(text(get()))
+                return next_index
+        return op
+
+    # --------------------------------------------
+    # String instructions
+
+    def _compile_CONCAT(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+        var = args[0][1]
+        store = self._variable_set(var)
+        get2 = self._symbol(args[2])
+        next_index = index + 1
+
+        # Append to same variable keeps its string builder
+        if args[1][0] == _VAR and args[1][1].frame == var.frame and args[1][1].slot == var.slot:
+            var_get_mutable = self.prog.var_get_mutable
+            string_append = program.string_append
+
+            def op():
+                value1 = var_get_mutable(var)
+                value2 = get2()
+                if (type(value1) is not str and type(value1) is not _BUILDER) or type(value2) is not str:
+                    error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires both arguments STRING type\n")
+                store(string_append(value1, value2))
+                return next_index
+        else:
+            get1 = self._symbol(args[1])
+
+            def op():
+                value1 = get1()
+                value2 = get2()
+                if type(value1) is not str or type(value2) is not str:
+                    error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires both arguments STRING type\n")
+                store(value1 + value2)
+                return next_index
+        return op
+
+    def _compile_STRLEN(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+        store = self._variable_set(args[0][1])
+        get = self._symbol(args[1])
+        next_index = index + 1
+
+        def op():
+            value = get()
+            if type(value) is not str:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires argument STRING type\n")
+            store(len(value))
+            return next_index
+        return op
+
+    def _compile_GETCHAR(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+        store = self._variable_set(args[0][1])
+        get1 = self._symbol(args[1])
+        get2 = self._symbol(args[2])
+        next_index = index + 1
+
+        def op():
+            value1 = get1()
+            value2 = get2()
+            if type(value1) is not str or type(value2) is not int:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires arguments STRING and INT type\n")
+            if value2 < 0 or value2 >= len(value1):
+                error.exit(error.code.ERR_CODE_STRING, f"Index out of range, must be in range 0..{len(value1) - 1}\n")
+            store(value1[value2])
+            return next_index
+        return op
+
+    def _compile_SETCHAR(self, index, instruction_in, args):
+        opcode = instruction_in.opcode
+        var = args[0][1]
+        var_get_mutable = self.prog.var_get_mutable
+        string_setchar = program.string_setchar
+        store = self._variable_set(var)
+        get2 = self._symbol(args[1])
+        get3 = self._symbol(args[2])
+        next_index = index + 1
+
+        # String is changed in place by string builder
+        def op():
+            value1 = var_get_mutable(var)
+            value2 = get2()
+            value3 = get3()
+            if (type(value1) is not str and type(value1) is not _BUILDER) or type(value2) is not int or type(value3) is not str:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires arguments STRING, INT and STRING type\n")
+            if value2 < 0 or value2 >= len(value1):
+                error.exit(error.code.ERR_CODE_STRING, f"Index out of range, must be in range 0..{len(value1) - 1}\n")
+            if len(value3) == 0:
+                error.exit(error.code.ERR_CODE_STRING, f"Operation '{opcode}' requires not empty STRING value\n")
+            store(string_setchar(value1, value2, value3[0]))
+            return next_index
+        return op
+
+    def _compile_TYPE(self, index, instruction_in, args):
+        store = self._variable_set(args[0][1])
+        get = self._symbol(args[1], False)
+        next_index = index + 1
+        names = instruction.TYPE_NAMES
+
+        def op():
+            store(names.get(type(get()), ""))
+            return next_index
+        return op
+
+    # --------------------------------------------
+    # Program flow
+
+    def _compile_LABEL(self, index, instruction_in, args):
+        next_index = index + 1
+        return lambda: next_index
+
+    def _compile_JUMP(self, index, instruction_in, args):
+        label_index = args[0][1]
+        return lambda: label_index
+
+    def _conditional_jump(self, index, instruction_in, args, equal):
+        opcode = instruction_in.opcode
+        label_index = args[0][1]
+        next_index = index + 1
+
+        if len(args) == 1:
+            pop2 = self.prog._data_stack.pop2
+
+            def op():
+                value1, value2 = pop2()
+                if type(value1) is not type(value2) and value1 is not None and value2 is not None:
+                    error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires both arguments same type (INT, FLOAT, STRING, BOOL) or NIL \n")
+                if (type(value1) is type(value2) and value1 == value2) == equal:
+                    return label_index
+                return next_index
+        elif self._same_type(args, _COMPARABLE + (inference.NIL,)):
+            get1 = self._symbol(args[1])
+            get2 = self._symbol(args[2])
+
+            # Operands of proven same type are compared without type check
+            def op():
+                if (get1() == get2()) == equal:
+                    return label_index
+                return next_index
+        else:
+            get1 = self._symbol(args[1])
+            get2 = self._symbol(args[2])
+
+            def op():
+                value1 = get1()
+                value2 = get2()
+                if type(value1) is not type(value2) and value1 is not None and value2 is not None:
+                    error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires both arguments same type (INT, FLOAT, STRING, BOOL) or NIL \n")
+                if (type(value1) is type(value2) and value1 == value2) == equal:
+                    return label_index
+                return next_index
+        return op
+
+    def _compile_JUMPIFEQ(self, index, instruction_in, args):
+        return self._conditional_jump(index, instruction_in, args, True)
+
+    def _compile_JUMPIFNEQ(self, index, instruction_in, args):
+        return self._conditional_jump(index, instruction_in, args, False)
+
+    def _compile_EXIT(self, index, instruction_in, args):
+        prog = self.prog
+        opcode = instruction_in.opcode
+        get = self._symbol(args[0])
+
+        def op():
+            value = get()
+            if type(value) is not int:
+                error.exit(error.code.ERR_CODE_TYPE, f"Operation '{opcode}' requires INT type\n")
+            if value < 0 or value > 49:
+                error.exit(error.code.ERR_CODE_ZERO, f"Operation '{opcode}' requires INT value in range 0-49\n")
+            prog.exit(value)
+            return prog.instructions_count()
+        return op
+
+    # --------------------------------------------
+    # Debug instructions
+
+    def _compile_DPRINT(self, index, instruction_in, args):
+        return self._compile_generic(index, instruction_in)
+
+    def _compile_BREAK(self, index, instruction_in, args):
+        prog = self.prog
+        next_index = index + 1
+
+        # Status is printed after program state is synchronized
+        def action():
+            prog.output_flush()
+            sys.stderr.write(prog.get_status())
+            sys.stderr.flush()
+            return next_index
+
+        def op():
+            raise _Sync(index, action)
+        return op
+
+    # --------------------------------------------
+    # Fused instructions (optimizer), other instructions of sequence are counted by program
+
+    def _compile_PUSHS_OP_POPS(self, index, instruction_in, args):
+        prog = self.prog
+        operation = self._compile_instruction(index, instruction_in.operation)
+        next_index = index + 4
+
+        def op():
+            operation()
+            prog._instructions_fused += 3
+            return next_index
+        return op
+
+    def _compile_COMPARE_JUMP(self, index, instruction_in, args):
+        prog = self.prog
+        compare = self._compile_instruction(index, instruction_in.compare)
+        self.index = index + 1
+        get = self._variable_get(instruction_in.var)
+        jump_on = instruction_in.jump_on
+        label_index = instruction_in.label_index
+        next_index = index + 2
+
+        def op():
+            compare()
+            prog._instructions_fused += 1
+            if get() == jump_on:
+                return label_index
+            return next_index
+        return op
+
+    def _compile_CREATEFRAME_PUSHFRAME(self, index, instruction_in, args):
+        prog = self.prog
+        frame_create = prog.frame_create
+        frame_push = self._frame_push()
+        next_index = index + 2
+
+        def op():
+            frame_create()
+            frame_push()
+            prog._instructions_fused += 1
+            return next_index
+        return op
+
+    def _compile_POPFRAME_RETURN(self, index, instruction_in, args):
+        prog = self.prog
+        frame_pop = prog.frame_pop
+        call_stack_pop = prog.call_stack_pop
+
+        # Initialized variables are counted by program
+        if prog._vars_tracking:
+            def op():
+                frame_pop()
+                prog._instructions_fused += 1
+                return call_stack_pop()
+            return op
+
+        def op():
+            frame = prog._frame_local
+            if frame is None:
+                error.exit(error.code.ERR_CODE_FRAME, "Local frame is not defined\n")
+            prog._frame_temp = frame
+            frames = prog._frame_stack
+            prog._frame_local = frames.pop() if frames else None
+            prog._instructions_fused += 1
+            calls = prog._call_stack
+            if not calls:
+                error.exit(error.code.ERR_CODE_VALUE, "Call stack is empty\n")
+            return calls.pop()
+        return op
+
+    def _compile_CALL_FRAME(self, index, instruction_in, args):
+        prog = self.prog
+        frame_create = prog.frame_create
+        label_index = instruction_in.label_index
+        return_index = index + len(instruction_in.instructions)
+        count = len(instruction_in.instructions) - 1
+
+        # Initialized variables are counted by program
+        if prog._vars_tracking:
+            params = [(self._variable_set(var), self._symbol(symb), var) for var, symb in instruction_in.params]
+            var_define = prog.var_define
+
+            def op():
+                frame_create()
+                for store, get, var in params:
+                    var_define(var)
+                    store(get())
+                prog._instructions_fused += count
+                prog._call_stack.append(return_index)
+                return label_index
+        else:
+            # New frame is created here, dropped temp frame is not needed by anything
+            params = [(var.slot, self._symbol(symb)) for var, symb in instruction_in.params]
+            empty = [_UNDEFINED] * len(prog._slots_local)
+
+            def op():
+                prog._frame_temp = frame = empty.copy()
+                for slot, get in params:
+                    frame[slot] = get()
+                prog._instructions_fused += count
+                prog._call_stack.append(return_index)
+                return label_index
+        return op
+
+    def _compile_LABEL_PUSHFRAME(self, index, instruction_in, args):
+        prog = self.prog
+        frame_push = self._frame_push()
+        next_index = index + 2
+
+        def op():
+            frame_push()
+            prog._instructions_fused += 1
+            return next_index
+        return op
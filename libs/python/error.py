@@ -6,10 +6,16 @@
 
 import sys
 
+# Flush of buffered program output, called before message is written
+flush_output = None
+
 class code:
     ERR_PARAMS = 10
     ERR_INPUT = 11
     ERR_OUTPUT = 12
+    ERR_SOURCE_HEADER = 21
+    ERR_SOURCE_OPCODE = 22
+    ERR_SOURCE_SYNTAX = 23
     ERR_XML_FORMAT = 31
     ERR_XML_SYNTAX = 32
     ERR_XML_SEMANTIC = 52
@@ -22,11 +28,15 @@ class code:
     ERR_INTERNAL = 99
 
 def exit(err_code: code, err_msg: str = ""):
+    if flush_output is not None:
+        flush_output()
     sys.stdout.flush()
     if err_msg:
         sys.stderr.write(f'Error: {err_msg}')
     sys.exit(err_code)
 
 def print(err_msg: str):
+    if flush_output is not None:
+        flush_output()
     sys.stdout.flush()
     sys.stderr.write(f'Warning: {err_msg}')
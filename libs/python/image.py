@@ -0,0 +1,225 @@
+# IPP 2023, project 2
+# Author: Marek Gergel, xgerge01
+# File: image.py
+# Description: Memory mapped bytecode image of validated and linked programs
+# Date: 2023-04-07
+
+from . import cache,error,instruction,optimizer,program
+import array,marshal,mmap,os,struct,sys
+
+# Image layout: header, code table of fixed width records and pool (marshal) with opcodes, constants,
+# labels and variable names of slots
+_MAGIC = b"IPPIMG23"
+_VERSION = 1
+_HEADER = struct.Struct("<8sIIII")
+
+# Record of instruction (unsigned 32 bit words): opcode, order, operand kinds and three operand values
+_RECORD = 6
+_WORDS = "I"
+
+# Operand kinds (4 bits per operand in kinds word)
+class _Kind:
+    NONE = 0
+    GF = 1
+    LF = 2
+    TF = 3
+    POOL = 4
+    TARGET = 5
+
+_FRAME_KINDS = {
+    program.Program._Frame.GF: _Kind.GF,
+    program.Program._Frame.LF: _Kind.LF,
+    program.Program._Frame.TF: _Kind.TF,
+}
+_KIND_FRAMES = {kind: frame for frame, kind in _FRAME_KINDS.items()}
+
+def write(prog: program.Program, path: str):
+    # Program has to be linked and not optimized (fused instructions are not stored)
+    opcodes = {}
+    constants = {}
+    words = array.array(_WORDS)
+
+    def pool_index(arg_type, value) -> int:
+        # Constants are stored once, float key is its hex form (0.0 and -0.0 are equal keys)
+        tag = cache.TYPE_TAGS[arg_type]
+        key = tag, type(value), value.hex() if type(value) is float else value
+        if key not in constants:
+            constants[key] = len(constants), (tag, value)
+        return constants[key][0]
+
+    try:
+        for instruction_in in prog._instructions:
+            name = type(instruction_in).__name__
+            opcode = opcodes.setdefault((name, instruction_in.opcode), len(opcodes))
+            kinds = len(instruction_in.args)
+            values = [0, 0, 0]
+            for index in range(len(instruction_in.args)):
+                arg_type, value = instruction_in.args[index]
+                if arg_type == program.Program.DataType.VAR:
+                    kind, values[index] = _FRAME_KINDS[value.frame], value.slot
+                elif arg_type is None and type(value) is int:
+                    kind, values[index] = _Kind.TARGET, value
+                else:
+                    kind, values[index] = _Kind.POOL, pool_index(arg_type, value)
+                kinds |= kind << (4 * (index + 1))
+            words.extend((opcode, instruction_in.order, kinds, *values))
+    except OverflowError:
+        error.exit(error.code.ERR_OUTPUT, f"Image file '{path}' could not be written, order or operand is out of range\n")
+
+    if sys.byteorder == "big":
+        words.byteswap()
+
+    def names(slots: dict) -> list:
+        return [name for name, slot in sorted(slots.items(), key=lambda item: item[1])]
+
+    pool = marshal.dumps((
+        [key for key, index in sorted(opcodes.items(), key=lambda item: item[1])],
+        [constant for index, constant in sorted(constants.values())],
+        list(prog._labels.items()),
+        names(prog._slots_global),
+        names(prog._slots_local),
+    ))
+
+    # Code table is aligned, so it can be cast to words directly from mapped file
+    code_offset = (_HEADER.size + 7) & ~7
+    pool_offset = code_offset + len(words) * words.itemsize
+    try:
+        path_tmp = f"{path}.{os.getpid()}.tmp"
+        with open(path_tmp, "wb") as image_file:
+            image_file.write(_HEADER.pack(_MAGIC, _VERSION, len(prog._instructions), code_offset, pool_offset))
+            image_file.write(bytes(code_offset - _HEADER.size))
+            image_file.write(words.tobytes())
+            image_file.write(pool)
+        os.replace(path_tmp, path)
+    except OSError:
+        error.exit(error.code.ERR_OUTPUT, f"Image file '{path}' could not be written\n")
+
+# --------------------------------------------
+
+class Pending(instruction.Instruction):
+
+    # Placeholder of every instruction which was not decoded yet, instruction on index of program
+    # counter is decoded at its first execution
+    def __init__(self, image):
+        super().__init__("PENDING", {})
+        self.image = image
+
+    def decode(self, prog: program.Program, index: int) -> instruction.Instruction:
+        instruction_in = self.image.decode(index)
+        prog._instructions[index] = instruction_in
+        return instruction_in
+
+    def execute(self, prog: program.Program):
+        self.decode(prog, prog._instruction_next_index).execute(prog)
+
+class Instructions:
+
+    # Read only sequence of instructions decoded from image on every access (optimizer looks ahead with it)
+    def __init__(self, image):
+        self.image = image
+
+    def __len__(self) -> int:
+        return self.image.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.image.decode_record(record) for record in range(*index.indices(self.image.count))]
+        if index < 0 or index >= self.image.count:
+            raise IndexError(index)
+        return self.image.decode_record(index)
+
+class Image:
+
+    def __init__(self, path: str):
+        self.path = path
+
+        # Pages of code table are shared by every process which maps same image
+        try:
+            with open(path, "rb") as image_file:
+                self.map = mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, self.count, code_offset, pool_offset = _HEADER.unpack_from(self.map)
+            if magic != _MAGIC or version != _VERSION or pool_offset != code_offset + self.count * _RECORD * 4:
+                raise ValueError(path)
+            code = memoryview(self.map)[code_offset:pool_offset]
+            self.code = code.cast(_WORDS) if sys.byteorder == "little" else self._swapped(code)
+            if len(self.code) != self.count * _RECORD:
+                raise ValueError(path)
+            opcodes, constants, self.labels, self.names_global, self.names_local = marshal.loads(self.map[pool_offset:])
+            if any(type(index) is not int or not 0 <= index < self.count for label, index in self.labels):
+                raise ValueError(path)
+            self.classes = [(self._instruction_class(name), opcode) for name, opcode in opcodes]
+            self.constants = [(cache.TAG_TYPES[tag], value) for tag, value in constants]
+        except Exception:
+            error.exit(error.code.ERR_INPUT, f"Image file '{path}' does not exist or is not valid\n")
+
+        # Variable references are shared by all instructions
+        self.variables = {}
+        self.optimizer = None
+
+    def _swapped(self, code) -> array.array:
+        # Big endian machine has to copy code table
+        words = array.array(_WORDS, code.tobytes())
+        words.byteswap()
+        return words
+
+    def _instruction_class(self, name: str):
+        instruction_class = getattr(instruction, name)
+        if not issubclass(instruction_class, instruction.Instruction):
+            raise TypeError(name)
+        return instruction_class
+
+    def load(self, prog: program.Program, lazy: bool = True, optimize: bool = False):
+        # Labels and slots are loaded at once, instructions are decoded at first execution when lazy
+        for label, index in self.labels:
+            prog.label_create(label, index)
+        prog._slots_global = {name: slot for slot, name in enumerate(self.names_global)}
+        prog._slots_local = {name: slot for slot, name in enumerate(self.names_local)}
+        prog._frame_global = prog._frame_new(len(self.names_global))
+
+        if lazy:
+            self.optimizer = optimizer.Optimizer(prog) if optimize else None
+            prog._instructions = [Pending(self)] * self.count
+        else:
+            prog._instructions = [self.decode_record(index) for index in range(self.count)]
+
+    def decode(self, index: int) -> instruction.Instruction:
+        # Instruction on index, sequence starting on it is fused when image is optimized
+        if self.optimizer is not None:
+            fused = self.optimizer.fuse(Instructions(self), index)
+            if fused is not None:
+                return fused
+        return self.decode_record(index)
+
+    def decode_record(self, index: int) -> instruction.Instruction:
+        # Every operand of record is checked, so corrupted image is error of input and not of interpret
+        code = self.code
+        base = index * _RECORD
+        kinds = code[base + 2]
+        if code[base] >= len(self.classes) or kinds & 0xF > 3:
+            self._invalid(index)
+        instruction_class, opcode = self.classes[code[base]]
+
+        args = {}
+        for arg in range(kinds & 0xF):
+            kind = (kinds >> (4 * (arg + 1))) & 0xF
+            value = code[base + 3 + arg]
+            if kind == _Kind.POOL and value < len(self.constants):
+                args[arg] = self.constants[value]
+            elif kind == _Kind.TARGET and value < self.count:
+                args[arg] = None, value
+            elif kind in _KIND_FRAMES and value < len(self.names_global if kind == _Kind.GF else self.names_local):
+                args[arg] = program.Program.DataType.VAR, self._variable(kind, value)
+            else:
+                self._invalid(index)
+        return instruction_class(opcode, args, code[base + 1])
+
+    def _invalid(self, index: int):
+        error.exit(error.code.ERR_INPUT, f"Image file '{self.path}' has invalid instruction record {index}\n")
+
+    def _variable(self, kind: int, slot: int) -> program.Program.Variable:
+        var = self.variables.get((kind, slot))
+        if var is None:
+            names = self.names_global if kind == _Kind.GF else self.names_local
+            var = self.variables[kind, slot] = program.Program.Variable(_KIND_FRAMES[kind], names[slot])
+            var.slot = slot
+        return var
@@ -0,0 +1,152 @@
+# IPP 2023, project 2
+# Author: Marek Gergel, xgerge01
+# File: inference.py
+# Description: Static inference of types and definedness of global variables on control flow graph
+# Date: 2023-04-07
+
+from . import cfg,instruction,optimizer,program
+
+# Possible states of variable (bit mask), values are types of native values
+UNDEFINED = 1
+UNINITIALIZED = 2
+INT = 4
+BOOL = 8
+STRING = 16
+FLOAT = 32
+NIL = 64
+VALUES = INT | BOOL | STRING | FLOAT | NIL
+ALL = UNDEFINED | UNINITIALIZED | VALUES
+
+TYPE_MASKS = {
+    int: INT,
+    bool: BOOL,
+    str: STRING,
+    float: FLOAT,
+    program.Program.DataType.NIL: NIL,
+}
+
+_READ_MASKS = {
+    program.Program.DataType.INT: INT | NIL,
+    program.Program.DataType.BOOL: BOOL | NIL,
+    program.Program.DataType.STRING: STRING | NIL,
+    program.Program.DataType.FLOAT: FLOAT | NIL,
+}
+
+# Result of instructions which store value of one type to variable
+_RESULTS = {
+    instruction.DIV: FLOAT,
+    instruction.IDIV: INT,
+    instruction.LT: BOOL,
+    instruction.GT: BOOL,
+    instruction.EQ: BOOL,
+    instruction.AND: BOOL,
+    instruction.OR: BOOL,
+    instruction.NOT: BOOL,
+    instruction.INT2CHAR: STRING,
+    instruction.STRI2INT: INT,
+    instruction.INT2FLOAT: FLOAT,
+    instruction.FLOAT2INT: INT,
+    instruction.CONCAT: STRING,
+    instruction.STRLEN: INT,
+    instruction.GETCHAR: STRING,
+    instruction.SETCHAR: STRING,
+    instruction.TYPE: STRING,
+    instruction.POPS: VALUES,
+}
+
+_ARITHMETIC = (instruction.ADD, instruction.SUB, instruction.MUL)
+
+class Inference:
+
+    def __init__(self, prog: program.Program):
+        # Fused instructions are analysed as their original sequences
+        self.instructions = [instruction_in.instructions[0] if isinstance(instruction_in, optimizer.Fused) else instruction_in
+            for instruction_in in prog._instructions]
+        self.graph = cfg.Graph(self.instructions)
+        self.slots = len(prog._slots_global)
+
+        # State of every global variable at start of every block, None if block is never reached
+        self.states = [None] * len(self.graph.blocks)
+        self._cache = None
+        if self.graph.blocks:
+            self._solve()
+
+    def _solve(self):
+        blocks = self.graph.blocks
+        self.states[0] = [UNDEFINED] * self.slots
+        pending = {0}
+
+        # Forward analysis, states only grow and every mask has few bits, so it ends
+        while pending:
+            number = pending.pop()
+            block = blocks[number]
+            state = self.states[number].copy()
+            for index in range(block.start, block.end):
+                self._transfer(state, self.instructions[index])
+
+            for successor in block.successors:
+                successor_state = self.states[successor.number]
+                if successor_state is None:
+                    self.states[successor.number] = state.copy()
+                elif any(mask & ~old for mask, old in zip(state, successor_state)):
+                    self.states[successor.number] = [mask | old for mask, old in zip(state, successor_state)]
+                else:
+                    continue
+                pending.add(successor.number)
+
+    def _transfer(self, state: list, instruction_in):
+        # Only instructions which store to global variable change state
+        args = instruction_in.args
+        if not args or args[0][0] != program.Program.DataType.VAR or args[0][1].frame != program.Program._Frame.GF:
+            return
+        slot = args[0][1].slot
+        kind = type(instruction_in)
+
+        if kind is instruction.DEFVAR:
+            state[slot] = UNINITIALIZED
+        elif kind is instruction.MOVE:
+            state[slot] = self._symbol(state, args[1])
+        elif kind in _ARITHMETIC:
+            # Operation succeeds only with both operands of same numeric type
+            state[slot] = self._symbol(state, args[1]) & self._symbol(state, args[2]) & (INT | FLOAT)
+        elif kind is instruction.READ:
+            state[slot] = _READ_MASKS.get(args[1][1], 0)
+        elif kind in _RESULTS:
+            state[slot] = _RESULTS[kind]
+
+    def _symbol(self, state: list, symb) -> int:
+        if symb[0] != program.Program.DataType.VAR:
+            return TYPE_MASKS[symb[0]]
+        if symb[1].frame != program.Program._Frame.GF:
+            return VALUES
+        return state[symb[1].slot] & VALUES
+
+    def _state(self, index: int):
+        # State before instruction on index, instructions of block are replayed from last query or block start
+        number = self.graph.block_index[index]
+        if self.states[number] is None:
+            return None
+        if self._cache is not None and self._cache[0] == number and self._cache[1] <= index:
+            position, state = self._cache[1], self._cache[2]
+        else:
+            position, state = self.graph.blocks[number].start, self.states[number].copy()
+        while position < index:
+            self._transfer(state, self.instructions[position])
+            position += 1
+        self._cache = number, position, state
+        return state
+
+    def mask(self, index: int, var: program.Program.Variable) -> int:
+        # Possible states of variable before instruction on index, variables of other frames can be in any state
+        if var.frame != program.Program._Frame.GF or index >= len(self.instructions):
+            return ALL
+        state = self._state(index)
+        if state is None:
+            return ALL
+        return state[var.slot]
+
+    def symbol_mask(self, index: int, symb) -> int:
+        # Possible types of symbol value read by instruction on index
+        if symb[0] != program.Program.DataType.VAR:
+            return TYPE_MASKS[symb[0]]
+        return self.mask(index, symb[1]) & VALUES
@@ -5,13 +5,14 @@
 # Date: 2023-04-07
 
 from . import error,program
-import sys,re
+import sys
 
 class Instruction:
 
-    def __init__(self, opcode, args):
+    def __init__(self, opcode, args, order=None):
         self.opcode = opcode
-        self.args = args 
+        self.args = args
+        self.order = order
 
     def execute(self, prog: program.Program):
         pass
@@ -22,8 +23,7 @@ class MOVE(Instruction):
 
     def execute(self, prog: program.Program):
         prog.instruction_counter_inc()
-        type, value = _get_value(prog, self.args[1], True)
-        prog.var_set(self.args[0][1], type, value)
+        prog.var_set(self.args[0][1], _get_value(prog, self.args[1], True))
 
 class CREATEFRAME(Instruction):
 
@@ -59,8 +59,8 @@ class CALL(Instruction):
         # Push next instruction index to call stack
         prog.call_stack_push(prog.instruction_counter_get())
 
-        # Jump
-        prog.instruction_counter_set(prog.label_get_index(self.args[0][1]))
+        # Jump (label is resolved to instruction index by parser)
+        prog.instruction_counter_set(self.args[0][1])
 
 class RETURN(Instruction):
 
@@ -72,18 +72,16 @@ class PUSHS(Instruction):
     def execute(self, prog: program.Program):
         prog.instruction_counter_inc()
 
-        # Get symbol type and value and push to data stack
-        type, value = _get_value(prog, self.args[0], True)
-        prog.data_stack_push(type, value)
+        # Get symbol value and push to data stack
+        prog.data_stack_push(_get_value(prog, self.args[0], True))
 
 class POPS(Instruction):
 
     def execute(self, prog: program.Program):
         prog.instruction_counter_inc()
 
-        # Pop type and value from data stack and assign to variable
-        type, value = prog.data_stack_pop()
-        prog.var_set(self.args[0][1], type, value)
+        # Pop value from data stack and assign to variable
+        prog.var_set(self.args[0][1], prog.data_stack_pop())
 
 class CLEARS(Instruction):
 
@@ -97,19 +95,19 @@ class ADD(Instruction):
         prog.instruction_counter_inc()
 
         if (len(self.args) == 0):
-            type2, value2 = prog.data_stack_pop()
-            type1, value1 = prog.data_stack_pop()
+            value1, value2 = prog.data_stack_pop2()
         else:
-            type1, value1 = _get_value(prog, self.args[1], True)
-            type2, value2 = _get_value(prog, self.args[2], True)
+            value1 = _get_value(prog, self.args[1], True)
+            value2 = _get_value(prog, self.args[2], True)
 
-        if type1 != int or type2 != int:
-            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments INT type\n")
+        value_type = type(value1)
+        if (value_type is not int and value_type is not float) or type(value2) is not value_type:
+            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments INT or FLOAT type\n")
 
         if (len(self.args) == 0):
-            prog.data_stack_push(int, value1 + value2)
+            prog.data_stack_push(value1 + value2)
         else:
-            prog.var_set(self.args[0][1], int, value1 + value2)
+            prog.var_set(self.args[0][1], value1 + value2)
 
 class SUB(Instruction):
 
@@ -117,19 +115,19 @@ class SUB(Instruction):
         prog.instruction_counter_inc()
 
         if (len(self.args) == 0):
-            type2, value2 = prog.data_stack_pop()
-            type1, value1 = prog.data_stack_pop()
+            value1, value2 = prog.data_stack_pop2()
         else:
-            type1, value1 = _get_value(prog, self.args[1], True)
-            type2, value2 = _get_value(prog, self.args[2], True)
+            value1 = _get_value(prog, self.args[1], True)
+            value2 = _get_value(prog, self.args[2], True)
 
-        if type1 != int or type2 != int:
-            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments INT type\n")
+        value_type = type(value1)
+        if (value_type is not int and value_type is not float) or type(value2) is not value_type:
+            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments INT or FLOAT type\n")
 
         if (len(self.args) == 0):
-            prog.data_stack_push(int, value1 - value2)
+            prog.data_stack_push(value1 - value2)
         else:
-            prog.var_set(self.args[0][1], int, value1 - value2)
+            prog.var_set(self.args[0][1], value1 - value2)
 
 class MUL(Instruction):
 
@@ -137,19 +135,40 @@ class MUL(Instruction):
         prog.instruction_counter_inc()
 
         if (len(self.args) == 0):
-            type2, value2 = prog.data_stack_pop()
-            type1, value1 = prog.data_stack_pop()
+            value1, value2 = prog.data_stack_pop2()
         else:
-            type1, value1 = _get_value(prog, self.args[1], True)
-            type2, value2 = _get_value(prog, self.args[2], True)
+            value1 = _get_value(prog, self.args[1], True)
+            value2 = _get_value(prog, self.args[2], True)
 
-        if type1 != int or type2 != int:
-            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments INT type\n")
+        value_type = type(value1)
+        if (value_type is not int and value_type is not float) or type(value2) is not value_type:
+            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments INT or FLOAT type\n")
 
         if (len(self.args) == 0):
-            prog.data_stack_push(int, value1 * value2)
+            prog.data_stack_push(value1 * value2)
         else:
-            prog.var_set(self.args[0][1], int, value1 * value2)
+            prog.var_set(self.args[0][1], value1 * value2)
+
+class DIV(Instruction):
+
+    def execute(self, prog: program.Program):
+        prog.instruction_counter_inc()
+
+        if (len(self.args) == 0):
+            value1, value2 = prog.data_stack_pop2()
+        else:
+            value1 = _get_value(prog, self.args[1], True)
+            value2 = _get_value(prog, self.args[2], True)
+
+        if type(value1) is not float or type(value2) is not float:
+            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments FLOAT type\n")
+        if value2 == 0:
+            error.exit(error.code.ERR_CODE_ZERO, f"Operation '{self.opcode}' cannot divide by zero\n")
+
+        if (len(self.args) == 0):
+            prog.data_stack_push(value1 / value2)
+        else:
+            prog.var_set(self.args[0][1], value1 / value2)
 
 class IDIV(Instruction):
 
@@ -157,42 +176,39 @@ class IDIV(Instruction):
         prog.instruction_counter_inc()
 
         if (len(self.args) == 0):
-            type2, value2 = prog.data_stack_pop()
-            type1, value1 = prog.data_stack_pop()
+            value1, value2 = prog.data_stack_pop2()
         else:
-            type1, value1 = _get_value(prog, self.args[1], True)
-            type2, value2 = _get_value(prog, self.args[2], True)
+            value1 = _get_value(prog, self.args[1], True)
+            value2 = _get_value(prog, self.args[2], True)
 
-        if type1 != int or type2 != int:
+        if type(value1) is not int or type(value2) is not int:
             error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments INT type\n")
-        
-        try:
-            if (len(self.args) == 0):
-                prog.data_stack_push(int, value1 // value2)
-            else:
-                prog.var_set(self.args[0][1], int, value1 // value2)
-        except ZeroDivisionError:
+        if value2 == 0:
             error.exit(error.code.ERR_CODE_ZERO, f"Operation '{self.opcode}' cannot divide by zero\n")
 
+        if (len(self.args) == 0):
+            prog.data_stack_push(value1 // value2)
+        else:
+            prog.var_set(self.args[0][1], value1 // value2)
+
 class LT(Instruction):
 
     def execute(self, prog: program.Program):
         prog.instruction_counter_inc()
 
         if (len(self.args) == 0):
-            type2, value2 = prog.data_stack_pop()
-            type1, value1 = prog.data_stack_pop()
+            value1, value2 = prog.data_stack_pop2()
         else:
-            type1, value1 = _get_value(prog, self.args[1], True)
-            type2, value2 = _get_value(prog, self.args[2], True)
+            value1 = _get_value(prog, self.args[1], True)
+            value2 = _get_value(prog, self.args[2], True)
+
+        if type(value1) is not type(value2) or value1 is None:
+            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments same type (INT, FLOAT, STRING, BOOL) \n")
 
-        if type1 != type2 or type1 == program.Program.DataType.NIL or type2 == program.Program.DataType.NIL:
-            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments same type (INT, STRING, BOOL) \n")
-        
         if (len(self.args) == 0):
-            prog.data_stack_push(bool, value1 < value2)
+            prog.data_stack_push(value1 < value2)
         else:
-            prog.var_set(self.args[0][1], bool, value1 < value2)
+            prog.var_set(self.args[0][1], value1 < value2)
 
 class GT(Instruction):
 
@@ -200,19 +216,18 @@ class GT(Instruction):
         prog.instruction_counter_inc()
 
         if (len(self.args) == 0):
-            type2, value2 = prog.data_stack_pop()
-            type1, value1 = prog.data_stack_pop()
+            value1, value2 = prog.data_stack_pop2()
         else:
-            type1, value1 = _get_value(prog, self.args[1], True)
-            type2, value2 = _get_value(prog, self.args[2], True)
+            value1 = _get_value(prog, self.args[1], True)
+            value2 = _get_value(prog, self.args[2], True)
 
-        if type1 != type2 or type1 == program.Program.DataType.NIL or type2 == program.Program.DataType.NIL:
-            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments same type (INT, STRING, BOOL) \n")
+        if type(value1) is not type(value2) or value1 is None:
+            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments same type (INT, FLOAT, STRING, BOOL) \n")
 
         if (len(self.args) == 0):
-            prog.data_stack_push(bool, value1 > value2)
+            prog.data_stack_push(value1 > value2)
         else:
-            prog.var_set(self.args[0][1], bool, value1 > value2)
+            prog.var_set(self.args[0][1], value1 > value2)
 
 class EQ(Instruction):
 
@@ -220,19 +235,18 @@ class EQ(Instruction):
         prog.instruction_counter_inc()
 
         if (len(self.args) == 0):
-            type2, value2 = prog.data_stack_pop()
-            type1, value1 = prog.data_stack_pop()
+            value1, value2 = prog.data_stack_pop2()
         else:
-            type1, value1 = _get_value(prog, self.args[1], True)
-            type2, value2 = _get_value(prog, self.args[2], True)
+            value1 = _get_value(prog, self.args[1], True)
+            value2 = _get_value(prog, self.args[2], True)
 
-        if type1 != type2 and type1 != program.Program.DataType.NIL and type2 != program.Program.DataType.NIL:
-            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments same type (INT, STRING, BOOL) or NIL \n")
+        if type(value1) is not type(value2) and value1 is not None and value2 is not None:
+            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments same type (INT, FLOAT, STRING, BOOL) or NIL \n")
 
         if (len(self.args) == 0):
-            prog.data_stack_push(bool, type1 == type2 and value1 == value2)
+            prog.data_stack_push(type(value1) is type(value2) and value1 == value2)
         else:
-            prog.var_set(self.args[0][1], bool, type1 == type2 and value1 == value2)
+            prog.var_set(self.args[0][1], type(value1) is type(value2) and value1 == value2)
 
 class AND(Instruction):
 
@@ -240,19 +254,18 @@ class AND(Instruction):
         prog.instruction_counter_inc()
 
         if (len(self.args) == 0):
-            type2, value2 = prog.data_stack_pop()
-            type1, value1 = prog.data_stack_pop()
+            value1, value2 = prog.data_stack_pop2()
         else:
-            type1, value1 = _get_value(prog, self.args[1], True)
-            type2, value2 = _get_value(prog, self.args[2], True)
+            value1 = _get_value(prog, self.args[1], True)
+            value2 = _get_value(prog, self.args[2], True)
 
-        if type1 != bool or type2 != bool:
+        if type(value1) is not bool or type(value2) is not bool:
             error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments BOOL type\n")
 
         if (len(self.args) == 0):
-            prog.data_stack_push(bool, value1 & value2)
+            prog.data_stack_push(value1 and value2)
         else:
-            prog.var_set(self.args[0][1], bool, value1 & value2)
+            prog.var_set(self.args[0][1], value1 and value2)
 
 class OR(Instruction):
 
@@ -260,19 +273,18 @@ class OR(Instruction):
         prog.instruction_counter_inc()
 
         if (len(self.args) == 0):
-            type2, value2 = prog.data_stack_pop()
-            type1, value1 = prog.data_stack_pop()
+            value1, value2 = prog.data_stack_pop2()
         else:
-            type1, value1 = _get_value(prog, self.args[1], True)
-            type2, value2 = _get_value(prog, self.args[2], True)
+            value1 = _get_value(prog, self.args[1], True)
+            value2 = _get_value(prog, self.args[2], True)
 
-        if type1 != bool or type2 != bool:
+        if type(value1) is not bool or type(value2) is not bool:
             error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments BOOL type\n")
 
         if (len(self.args) == 0):
-            prog.data_stack_push(bool, value1 | value2)
+            prog.data_stack_push(value1 or value2)
         else:
-            prog.var_set(self.args[0][1], bool, value1 | value2)
+            prog.var_set(self.args[0][1], value1 or value2)
 
 class NOT(Instruction):
 
@@ -280,17 +292,17 @@ class NOT(Instruction):
         prog.instruction_counter_inc()
 
         if (len(self.args) == 0):
-            type, value = prog.data_stack_pop()
+            value = prog.data_stack_pop()
         else:
-            type, value = _get_value(prog, self.args[1], True)
+            value = _get_value(prog, self.args[1], True)
 
-        if type != bool:
+        if type(value) is not bool:
             error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments BOOL type\n")
 
         if (len(self.args) == 0):
-            prog.data_stack_push(bool, not value)
+            prog.data_stack_push(not value)
         else:
-            prog.var_set(self.args[0][1], bool, not value)
+            prog.var_set(self.args[0][1], not value)
 
 class INT2CHAR(Instruction):
 
@@ -298,19 +310,19 @@ class INT2CHAR(Instruction):
         prog.instruction_counter_inc()
 
         if (len(self.args) == 0):
-            type, value = prog.data_stack_pop()
+            value = prog.data_stack_pop()
         else:
-            type, value = _get_value(prog, self.args[1], True)
+            value = _get_value(prog, self.args[1], True)
 
-        if type != int:
+        if type(value) is not int:
             error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires argument INT type\n")
 
         try:
             if (len(self.args) == 0):
-                prog.data_stack_push(str, chr(value))
+                prog.data_stack_push(chr(value))
             else:
-                prog.var_set(self.args[0][1], str, chr(value))
-        except ValueError:
+                prog.var_set(self.args[0][1], chr(value))
+        except (ValueError, OverflowError):
             error.exit(error.code.ERR_CODE_STRING, f"Operation '{self.opcode}' requires argument INT with unicode valid value\n")
 
 class STRI2INT(Instruction):
@@ -319,168 +331,172 @@ class STRI2INT(Instruction):
         prog.instruction_counter_inc()
 
         if (len(self.args) == 0):
-            type2, value2 = prog.data_stack_pop()
-            type1, value1 = prog.data_stack_pop()
+            value1, value2 = prog.data_stack_pop2()
         else:
-            type1, value1 = _get_value(prog, self.args[1], True)
-            type2, value2 = _get_value(prog, self.args[2], True)
+            value1 = _get_value(prog, self.args[1], True)
+            value2 = _get_value(prog, self.args[2], True)
 
-        if type1 != str or type2 != int:
+        if type(value1) is not str or type(value2) is not int:
             error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires arguments STRING and INT type\n")
 
+        if value2 < 0 or value2 >= len(value1):
+            error.exit(error.code.ERR_CODE_STRING, f"Index out of range, must be in range 0..{len(value1) - 1}\n")
+        if (len(self.args) == 0):
+            prog.data_stack_push(ord(value1[value2]))
+        else:
+            prog.var_set(self.args[0][1], ord(value1[value2]))
+
+class INT2FLOAT(Instruction):
+
+    def execute(self, prog: program.Program):
+        prog.instruction_counter_inc()
+
+        if (len(self.args) == 0):
+            value = prog.data_stack_pop()
+        else:
+            value = _get_value(prog, self.args[1], True)
+
+        if type(value) is not int:
+            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires argument INT type\n")
+
         try:
-            if value2 < 0 or value2 >= len(value1):
-                error.exit(error.code.ERR_CODE_STRING, f"Index out of range, must be in range 0..{len(value1) - 1}\n")
-            if (len(self.args) == 0):
-                prog.data_stack_push(int, ord(value1[value2]))
-            else:
-                prog.var_set(self.args[0][1], int, ord(value1[value2]))
-        except ValueError:
-            error.exit(error.code.ERR_CODE_TYPE, f"Index {value2} is not valid integer\n")
+            value = float(value)
+        except OverflowError:
+            error.exit(error.code.ERR_CODE_ZERO, f"Operation '{self.opcode}' requires argument INT in FLOAT range\n")
 
-class READ(Instruction):
+        if (len(self.args) == 0):
+            prog.data_stack_push(value)
+        else:
+            prog.var_set(self.args[0][1], value)
+
+class FLOAT2INT(Instruction):
 
     def execute(self, prog: program.Program):
         prog.instruction_counter_inc()
 
-        type = self.args[1][1]
+        if (len(self.args) == 0):
+            value = prog.data_stack_pop()
+        else:
+            value = _get_value(prog, self.args[1], True)
+
+        if type(value) is not float:
+            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires argument FLOAT type\n")
+
+        # Decimal part is truncated, infinity and NaN have no INT value
+        try:
+            value = int(value)
+        except (ValueError, OverflowError):
+            error.exit(error.code.ERR_CODE_ZERO, f"Operation '{self.opcode}' requires finite FLOAT value\n")
+
+        if (len(self.args) == 0):
+            prog.data_stack_push(value)
+        else:
+            prog.var_set(self.args[0][1], value)
+
+class READ(Instruction):
+
+    def execute(self, prog: program.Program):
+        prog.instruction_counter_inc()
 
         # Type conversion
-        match type:
+        match self.args[1][1]:
             case program.Program.DataType.INT:
-                type = int
+                read_type = int
             case program.Program.DataType.STRING:
-                type = str
+                read_type = str
             case program.Program.DataType.BOOL:
-                type = bool
+                read_type = bool
+            case program.Program.DataType.FLOAT:
+                read_type = float
             case _:
-                error.exit(error.code.ERR_XML_SEMANTIC, f"Operation '{self.opcode}' requires argument INT, STRING or BOOL type\n")
+                error.exit(error.code.ERR_XML_SEMANTIC, f"Operation '{self.opcode}' requires argument INT, FLOAT, STRING or BOOL type\n")
 
-        # Read input
-        try:
-            value = prog.input_file.readline()
-            if not value:
-                raise EOFError
-            value = value.strip()
-            
-            if type == int:
-                value = int(value)
-            elif type == bool:
-                if value == '':
-                    raise ValueError
-                elif value.lower() == 'true':
-                    value = True
-                else:
-                    value = False
-        except:
-            type = program.Program.DataType.NIL
-            value = program.Program.DataType.NIL
-
-        # Set variable
-        prog.var_set(self.args[0][1], type, value)
+        # Read input and set variable
+        prog.var_set(self.args[0][1], prog.input_read(read_type))
 
 class WRITE(Instruction):
 
     def execute(self, prog: program.Program):
         prog.instruction_counter_inc()
-        
-        # Get symbol
-        type, value = _get_value(prog, self.args[0], True)
-
-        # Nil
-        if type == program.Program.DataType.NIL:
-            value = ""
-        elif type == bool:
-            value = str(value).lower()
 
-        # Print
-        print(value, end='')
+        # Buffered print
+        prog.output_write(value_str(_get_value(prog, self.args[0], True)))
 
 class CONCAT(Instruction):
 
     def execute(self, prog: program.Program):
         prog.instruction_counter_inc()
 
-        type1, value1 = _get_value(prog, self.args[1], True)
-        type2, value2 = _get_value(prog, self.args[2], True)
+        var = self.args[0][1]
+        symb1 = self.args[1]
 
-        if type1 != str or type2 != str:
+        # Append to same variable keeps its string builder
+        append = symb1[0] == program.Program.DataType.VAR and symb1[1].frame == var.frame and symb1[1].slot == var.slot
+        value1 = prog.var_get_mutable(var) if append else _get_value(prog, symb1, True)
+        value2 = _get_value(prog, self.args[2], True)
+
+        if (type(value1) is not str and type(value1) is not program.StringBuilder) or type(value2) is not str:
             error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments STRING type\n")
 
-        prog.var_set(self.args[0][1], str, value1 + value2)
+        if append:
+            prog.var_set(var, program.string_append(value1, value2))
+        else:
+            prog.var_set(var, value1 + value2)
 
 class STRLEN(Instruction):
 
     def execute(self, prog: program.Program):
         prog.instruction_counter_inc()
 
-        type, value = _get_value(prog, self.args[1], True)
+        value = _get_value(prog, self.args[1], True)
 
-        if type != str:
+        if type(value) is not str:
             error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires argument STRING type\n")
 
-        prog.var_set(self.args[0][1], int, len(value))
+        prog.var_set(self.args[0][1], len(value))
 
 class GETCHAR(Instruction):
 
     def execute(self, prog: program.Program):
         prog.instruction_counter_inc()
-    
-        type1, value1 = _get_value(prog, self.args[1], True)
-        type2, value2 = _get_value(prog, self.args[2], True)
 
-        if type1 != str or type2 != int:
+        value1 = _get_value(prog, self.args[1], True)
+        value2 = _get_value(prog, self.args[2], True)
+
+        if type(value1) is not str or type(value2) is not int:
             error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires arguments STRING and INT type\n")
 
-        try:
-            if value2 < 0 or value2 >= len(value1):
-                error.exit(error.code.ERR_CODE_STRING, f"Index out of range, must be in range 0..{len(value1) - 1}\n")
-            prog.var_set(self.args[0][1], str, value1[value2])
-        except ValueError:
-            error.exit(error.code.ERR_CODE_TYPE, f"Index {value2} is not valid integer\n")
+        if value2 < 0 or value2 >= len(value1):
+            error.exit(error.code.ERR_CODE_STRING, f"Index out of range, must be in range 0..{len(value1) - 1}\n")
+        prog.var_set(self.args[0][1], value1[value2])
 
 class SETCHAR(Instruction):
 
     def execute(self, prog: program.Program):
         prog.instruction_counter_inc()
 
-        type1, value1 = _get_value(prog, self.args[0], True)
-        type2, value2 = _get_value(prog, self.args[1], True)
-        type3, value3 = _get_value(prog, self.args[2], True)
+        # String is changed in place by string builder
+        value1 = prog.var_get_mutable(self.args[0][1])
+        value2 = _get_value(prog, self.args[1], True)
+        value3 = _get_value(prog, self.args[2], True)
 
-        if type1 != str or type2 != int or type3 != str:
+        if (type(value1) is not str and type(value1) is not program.StringBuilder) or type(value2) is not int or type(value3) is not str:
             error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires arguments STRING, INT and STRING type\n")
 
-        try:
-            if value2 < 0 or value2 >= len(value1):
-                error.exit(error.code.ERR_CODE_STRING, f"Index out of range, must be in range 0..{len(value1) - 1}\n")
-            if len(value3) == 0:
-                error.exit(error.code.ERR_CODE_STRING, f"Operation '{self.opcode}' requires not empty STRING value\n")
-            value1_chars = list(value1)
-            value1_chars[value2] = value3[0]
-            prog.var_set(self.args[0][1], str, ''.join(value1_chars))
-        except ValueError:
-            error.exit(error.code.ERR_CODE_TYPE, f"Index {value2} is not valid integer\n")
+        if value2 < 0 or value2 >= len(value1):
+            error.exit(error.code.ERR_CODE_STRING, f"Index out of range, must be in range 0..{len(value1) - 1}\n")
+        if len(value3) == 0:
+            error.exit(error.code.ERR_CODE_STRING, f"Operation '{self.opcode}' requires not empty STRING value\n")
+        prog.var_set(self.args[0][1], program.string_setchar(value1, value2, value3[0]))
 
 class TYPE(Instruction):
 
     def execute(self, prog: program.Program):
         prog.instruction_counter_inc()
 
-        type, value = _get_value(prog, self.args[1])
-
-        if type == str:
-            type = program.Program.DataType.STRING
-        elif type == int:
-            type = program.Program.DataType.INT
-        elif type == bool:
-            type = program.Program.DataType.BOOL
-        elif type == program.Program.DataType.NIL:
-            type = program.Program.DataType.NIL
-        else:
-            type = ""
-
-        prog.var_set(self.args[0][1], str, type)
+        # Uninitialized variable has empty type
+        value = _get_value(prog, self.args[1])
+        prog.var_set(self.args[0][1], TYPE_NAMES.get(type(value), ""))
 
 class LABEL(Instruction):
 
@@ -490,30 +506,26 @@ class LABEL(Instruction):
 class JUMP(Instruction):
 
     def execute(self, prog: program.Program):
-        # Jump
-        prog.instruction_counter_set(prog.label_get_index(self.args[0][1]))
+        # Jump (label is resolved to instruction index by parser)
+        prog.instruction_counter_set(self.args[0][1])
 
 class JUMPIFEQ(Instruction):
 
     def execute(self, prog: program.Program):
         # Get symbols
         if (len(self.args) == 1):
-            type2, value2 = prog.data_stack_pop()
-            type1, value1 = prog.data_stack_pop()
+            value1, value2 = prog.data_stack_pop2()
         else:
-            type1, value1 = _get_value(prog, self.args[1], True)
-            type2, value2 = _get_value(prog, self.args[2], True)
+            value1 = _get_value(prog, self.args[1], True)
+            value2 = _get_value(prog, self.args[2], True)
 
         # Compare types
-        if type1 != type2 and type1 != program.Program.DataType.NIL and type2 != program.Program.DataType.NIL:
-            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments same type (INT, STRING, BOOL) or NIL \n")
-
-        # Get label index and verify
-        label_index = prog.label_get_index(self.args[0][1])
+        if type(value1) is not type(value2) and value1 is not None and value2 is not None:
+            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments same type (INT, FLOAT, STRING, BOOL) or NIL \n")
 
         # Jump
-        if type1 == type2 and value1 == value2:
-            prog.instruction_counter_set(label_index)
+        if type(value1) is type(value2) and value1 == value2:
+            prog.instruction_counter_set(self.args[0][1])
         else:
             prog.instruction_counter_inc()
 
@@ -522,22 +534,18 @@ class JUMPIFNEQ(Instruction):
     def execute(self, prog: program.Program):
         # Get symbols
         if (len(self.args) == 1):
-            type2, value2 = prog.data_stack_pop()
-            type1, value1 = prog.data_stack_pop()
+            value1, value2 = prog.data_stack_pop2()
         else:
-            type1, value1 = _get_value(prog, self.args[1], True)
-            type2, value2 = _get_value(prog, self.args[2], True)
+            value1 = _get_value(prog, self.args[1], True)
+            value2 = _get_value(prog, self.args[2], True)
 
         # Compare types
-        if type1 != type2 and type1 != program.Program.DataType.NIL and type2 != program.Program.DataType.NIL:
-            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments same type (INT, STRING, BOOL) or NIL \n")
-
-        # Get label index and verify
-        label_index = prog.label_get_index(self.args[0][1])
+        if type(value1) is not type(value2) and value1 is not None and value2 is not None:
+            error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires both arguments same type (INT, FLOAT, STRING, BOOL) or NIL \n")
 
         # Jump
-        if type1 != type2 or value1 != value2:
-            prog.instruction_counter_set(label_index)
+        if type(value1) is not type(value2) or value1 != value2:
+            prog.instruction_counter_set(self.args[0][1])
         else:
             prog.instruction_counter_inc()
 
@@ -547,9 +555,9 @@ class EXIT(Instruction):
         prog.instruction_counter_inc()
 
         # Get symbol
-        type, value = _get_value(prog, self.args[0], True)
+        value = _get_value(prog, self.args[0], True)
 
-        if type != int:
+        if type(value) is not int:
             error.exit(error.code.ERR_CODE_TYPE, f"Operation '{self.opcode}' requires INT type\n")
 
         if value < 0 or value > 49:
@@ -568,46 +576,49 @@ class DPRINT(Instruction):
             if not prog.var_is_defined(self.args[0][1]):
                 error.print("Variable is not defined\n")
                 return
-            type, value = prog.var_get(self.args[0][1])
+            value = prog.var_get(self.args[0][1])
         else:
-            value = _convert_str_to_value(self.args[0][0], self.args[0][1])
+            value = self.args[0][1]
 
-        # Print
-        sys.stderr.write(f"{value}")
+        # Print after buffered output
+        prog.output_flush()
+        sys.stderr.write(value_str(value))
 
 class BREAK(Instruction):
 
     def execute(self, prog: program.Program):
         prog.instruction_counter_inc()
+        prog.output_flush()
         sys.stderr.write(prog.get_status())
         sys.stderr.flush()
 
 # --------------------------------------------
 
-def _get_value(prog: program.Program, symb, must=False) -> tuple:
+# Names of value types for TYPE instruction, bool is separate type from int
+TYPE_NAMES = {
+    int: program.Program.DataType.INT,
+    bool: program.Program.DataType.BOOL,
+    str: program.Program.DataType.STRING,
+    float: program.Program.DataType.FLOAT,
+    type(None): program.Program.DataType.NIL,
+}
+
+def value_str(value) -> str:
+    # Text of value for output, nil is empty string
+    if type(value) is str:
+        return value
+    if value is None:
+        return ""
+    if type(value) is bool:
+        return "true" if value else "false"
+    if type(value) is float:
+        return value.hex()
+    return str(value)
+
+def _get_value(prog: program.Program, symb, must=False):
     # Symbol is variable
     if symb[0] == program.Program.DataType.VAR:
         return prog.var_get(symb[1], must)
-    # Symbol is constant
-    else:
-        return symb[0], _convert_str_to_value(symb[0], symb[1])
-
-def _convert_str_to_value(type, string: str):
-    if type == str:
-        if string == None:
-            return ""
-        return re.compile(rb"\\(\d{1,3})").sub(lambda m: bytes([int(m.group(1))]), string.encode()).decode()
-    elif type == bool:
-        if string.lower() == 'true':
-            return True
-        elif string.lower() == 'false':
-            return False
-        else:
-            error.exit(error.code.ERR_CODE_VALUE, f"Invalid value of bool: {string}\n")
-    elif type == int:
-        try:
-            return int(string)
-        except ValueError:
-            error.exit(error.code.ERR_XML_SYNTAX, f"Value '{string}' is not valid INT value\n")
+    # Symbol is constant (decoded by parser)
     else:
-        return program.Program.DataType.NIL
\ No newline at end of file
+        return symb[1]
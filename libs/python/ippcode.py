@@ -0,0 +1,143 @@
+# IPP 2023, project 2
+# Author: Marek Gergel, xgerge01
+# File: ippcode.py
+# Description: Script IPPcode23 source parsing without XML representation
+# Date: 2023-04-07
+
+from . import error,parser,program
+import io,re
+
+# Lexical rules of parse.php, lines without word character are skipped and whitespace is collapsed
+_WORD = re.compile(r"[A-Za-z0-9_]")
+_WHITESPACE = re.compile(r"[ \t\n\r\f\v]+")
+_TRIM = " \t\n\r\0\x0b"
+_HEADER = re.compile(r"\.ippcode23", re.IGNORECASE)
+
+_NAME = r"[a-zA-Z_\-$&%*!?][a-zA-Z0-9_\-$&%*!?]*"
+_LABEL = re.compile(_NAME)
+_VAR = re.compile(rf"(?:LF|TF|GF)@{_NAME}")
+_CONSTANT = re.compile(r"nil@nil|int@(?:[+-]?[0-9]+|nil)|string@(?:\\[0-9]{3}|[^\\])*|bool@(?:true|false|nil)|"
+    r"float@[+-]?(?i:(?:0x)?(?:[0-9a-f]+\.?[0-9a-f]*|\.[0-9a-f]+)(?:p[+-]?[0-9]+)?|inf(?:inity)?|nan)")
+_TYPE = re.compile(r"int|string|bool|float")
+
+# Operands of every opcode (var, symb, label or type)
+_OPERANDS = {
+    "MOVE": ("var", "symb"),
+    "CREATEFRAME": (),
+    "PUSHFRAME": (),
+    "POPFRAME": (),
+    "DEFVAR": ("var",),
+    "CALL": ("label",),
+    "RETURN": (),
+    "PUSHS": ("symb",),
+    "POPS": ("var",),
+    "ADD": ("var", "symb", "symb"),
+    "SUB": ("var", "symb", "symb"),
+    "MUL": ("var", "symb", "symb"),
+    "DIV": ("var", "symb", "symb"),
+    "IDIV": ("var", "symb", "symb"),
+    "LT": ("var", "symb", "symb"),
+    "GT": ("var", "symb", "symb"),
+    "EQ": ("var", "symb", "symb"),
+    "AND": ("var", "symb", "symb"),
+    "OR": ("var", "symb", "symb"),
+    "NOT": ("var", "symb"),
+    "INT2CHAR": ("var", "symb"),
+    "STRI2INT": ("var", "symb", "symb"),
+    "INT2FLOAT": ("var", "symb"),
+    "FLOAT2INT": ("var", "symb"),
+    "READ": ("var", "type"),
+    "WRITE": ("symb",),
+    "CONCAT": ("var", "symb", "symb"),
+    "STRLEN": ("var", "symb"),
+    "GETCHAR": ("var", "symb", "symb"),
+    "SETCHAR": ("var", "symb", "symb"),
+    "TYPE": ("var", "symb"),
+    "LABEL": ("label",),
+    "JUMP": ("label",),
+    "JUMPIFEQ": ("label", "symb", "symb"),
+    "JUMPIFNEQ": ("label", "symb", "symb"),
+    "EXIT": ("symb",),
+    "DPRINT": ("symb",),
+    "BREAK": (),
+    "CLEARS": (),
+    "ADDS": (),
+    "SUBS": (),
+    "MULS": (),
+    "DIVS": (),
+    "IDIVS": (),
+    "LTS": (),
+    "GTS": (),
+    "EQS": (),
+    "ANDS": (),
+    "ORS": (),
+    "NOTS": (),
+    "INT2CHARS": (),
+    "STRI2INTS": (),
+    "INT2FLOATS": (),
+    "FLOAT2INTS": (),
+    "JUMPIFEQS": ("label",),
+    "JUMPIFNEQS": ("label",),
+}
+
+class Parser(parser.Parser):
+
+    def parseCode(self, prog: program.Program):
+        lines = self._lines()
+
+        # Check header
+        header = next(lines, "")
+        if not _HEADER.fullmatch(header.strip(_TRIM)):
+            error.exit(error.code.ERR_SOURCE_HEADER, "Invalid header\n")
+
+        # Every line is checked before instructions are created, so lexical and syntax errors are reported first
+        records = []
+        for order, line in enumerate(lines, 1):
+            opcode, *operands = _WHITESPACE.split(line.strip(_TRIM))
+            opcode = opcode.upper() if opcode.isascii() else opcode
+            if opcode not in _OPERANDS:
+                error.exit(error.code.ERR_SOURCE_OPCODE, f"Invalid instruction '{opcode}'\n")
+
+            kinds = _OPERANDS[opcode]
+            if len(operands) != len(kinds):
+                error.exit(error.code.ERR_SOURCE_SYNTAX, f"Invalid instruction '{opcode}' with {len(operands)} arguments\n")
+
+            # Arguments are same as arguments of instruction element (tag, type, text)
+            arguments = [(f"arg{index}", *self._get_operand(kind, operand)) for index, (kind, operand) in enumerate(zip(kinds, operands), 1)]
+            records.append((order, ("instruction", opcode, arguments)))
+
+        self._load(prog, records)
+
+    def _lines(self):
+        # Lines of source with code, comments are removed
+        source = self.source_file
+        if not isinstance(source, io.TextIOBase):
+            source = io.TextIOWrapper(source, encoding="utf-8")
+
+        try:
+            for line in source:
+                line = line.split("#", 1)[0]
+                if _WORD.search(line):
+                    yield line
+        except UnicodeDecodeError:
+            error.exit(error.code.ERR_INPUT, "Source file is not valid UTF-8\n")
+
+    def _get_operand(self, kind: str, operand: str) -> tuple:
+        # Type and text of operand
+        match kind:
+            case "label":
+                if not _LABEL.fullmatch(operand):
+                    error.exit(error.code.ERR_SOURCE_SYNTAX, f"Invalid label '{operand}'\n")
+                return "label", operand
+            case "type":
+                if not _TYPE.fullmatch(operand):
+                    error.exit(error.code.ERR_SOURCE_SYNTAX, f"Invalid type '{operand}'\n")
+                return "type", operand
+            case _:
+                if _VAR.fullmatch(operand):
+                    return "var", operand
+                if kind == "var":
+                    error.exit(error.code.ERR_SOURCE_SYNTAX, f"Invalid variable '{operand}'\n")
+                if not _CONSTANT.fullmatch(operand):
+                    error.exit(error.code.ERR_SOURCE_SYNTAX, f"Invalid symbol '{operand}'\n")
+                return tuple(operand.split("@", 1))
@@ -0,0 +1,500 @@
+# IPP 2023, project 2
+# Author: Marek Gergel, xgerge01
+# File: jit.py
+# Description: Tracing compilation of hot loops of compiled code to Python functions
+# Date: 2023-04-07
+
+from . import compiler,instruction,optimizer,program
+
+# Backward jumps to label before its loop is recorded, longest recorded iteration and recordings of one label
+THRESHOLD = 100
+_TRACE_LIMIT = 2000
+_RECORDINGS = 3
+
+# Trace which leaves before end of first iteration on most of its entries is dropped
+_ENTRIES_CHECK = 64
+
+_GF = program.Program._Frame.GF
+_LF = program.Program._Frame.LF
+_TF = program.Program._Frame.TF
+_VAR = program.Program.DataType.VAR
+
+# Values which are not plain values of variable, they are handled by compiled code
+_SPECIAL = (program._Marker, program.StringBuilder)
+
+_FRAME_NAMES = {_GF: "gf", _LF: "lf", _TF: "tf"}
+
+# Biggest integer converted to FLOAT in trace, bigger ones are converted by compiled code
+_FLOAT_LIMIT = 2 ** 1023
+
+_READ_TYPES = {
+    program.Program.DataType.INT: int,
+    program.Program.DataType.STRING: str,
+    program.Program.DataType.BOOL: bool,
+    program.Program.DataType.FLOAT: float,
+}
+
+_BINARY = (instruction.ADD, instruction.SUB, instruction.MUL, instruction.DIV, instruction.IDIV, instruction.LT, instruction.GT,
+    instruction.EQ, instruction.AND, instruction.OR, instruction.STRI2INT, instruction.CONCAT, instruction.GETCHAR)
+_UNARY = (instruction.NOT, instruction.INT2CHAR, instruction.INT2FLOAT, instruction.FLOAT2INT, instruction.STRLEN)
+
+_SUPPORTED = _BINARY + _UNARY + (instruction.LABEL, instruction.JUMP, instruction.JUMPIFEQ, instruction.JUMPIFNEQ, instruction.MOVE,
+    instruction.TYPE, instruction.PUSHS, instruction.POPS, instruction.CLEARS, instruction.DEFVAR, instruction.CREATEFRAME,
+    instruction.PUSHFRAME, instruction.POPFRAME, instruction.CALL, instruction.RETURN, instruction.WRITE, instruction.READ)
+
+class _Unsupported(Exception):
+    pass
+
+class _Source:
+
+    # Python source of trace function, values are passed to factory of trace function as arguments
+    def __init__(self, path: list):
+        self.path = path
+        self.lines = []
+        self.values = {}
+        self.temps = 0
+
+        # Local and temp frame is checked once after it is loaded
+        self.checked = {_GF: True, _LF: False, _TF: False}
+
+    def emit(self, line: str):
+        self.lines.append("        " + line)
+
+    def value(self, value) -> str:
+        # Name of value bound to trace function
+        for name, bound in self.values.items():
+            if bound is value and type(bound) is type(value):
+                return name
+        name = f"k{len(self.values)}"
+        self.values[name] = value
+        return name
+
+    def temp(self) -> str:
+        self.temps += 1
+        return f"v{self.temps}"
+
+    def leave(self, position: int, index: int) -> str:
+        # Trace leaves before instruction on position of path, compiled code continues on index
+        return f"return leave(iterations, {position}, {index})"
+
+    def guard(self, condition: str, position: int):
+        self.emit(f"if {condition}: {self.leave(position, self.path[position])}")
+
+    def frame(self, frame: str, position: int) -> str:
+        if not self.checked[frame]:
+            self.guard(f"{_FRAME_NAMES[frame]} is None", position)
+            self.checked[frame] = True
+        return _FRAME_NAMES[frame]
+
+class Jit(compiler.Compiler):
+
+    def compile(self) -> list:
+        code = super().compile()
+        prog = self.prog
+
+        # Traces are recorded from original instructions of fused sequences
+        self.instructions = [instruction_in.instructions[0] if isinstance(instruction_in, optimizer.Fused) else instruction_in
+            for instruction_in in prog._instructions]
+        self.code = code
+        self.hits = {}
+        self.recordings = {}
+        self.labels = {}
+
+        # Closure which contains backward jump counts it when jump is taken
+        for index, instruction_in in enumerate(prog._instructions):
+            sequence = instruction_in.instructions if isinstance(instruction_in, optimizer.Fused) else [instruction_in]
+            if any(self._jump_backward(index + offset, jump) for offset, jump in enumerate(sequence)):
+                code[index] = self._counted(index, code[index])
+        return code
+
+    def _jump_backward(self, index: int, instruction_in) -> bool:
+        return isinstance(instruction_in, (instruction.JUMP, instruction.JUMPIFEQ, instruction.JUMPIFNEQ)) \
+            and instruction_in.args[0][1] <= index
+
+    def _counted(self, index: int, op):
+        hits = self.hits
+
+        def counted():
+            next_index = op()
+            if next_index <= index:
+                count = hits.get(next_index, 0) + 1
+                hits[next_index] = count
+                if count == THRESHOLD:
+                    # Loop is recorded when program state is synchronized
+                    raise compiler._Sync(index, lambda: self._record(next_index))
+            return next_index
+        return counted
+
+    # --------------------------------------------
+    # Recording
+
+    def _record(self, label_index: int) -> int:
+        # One iteration of loop is executed by instructions, executed path and types of operands are recorded
+        prog = self.prog
+        prog._instruction_next_index = label_index
+        recordings = self.recordings.get(label_index, 0)
+        if recordings >= _RECORDINGS or not isinstance(self.instructions[label_index], instruction.LABEL):
+            return label_index
+        self.recordings[label_index] = recordings + 1
+
+        path = []
+        types = []
+        index = label_index
+        count = len(self.instructions)
+        while len(path) < _TRACE_LIMIT:
+            instruction_in = self.instructions[index]
+            observed = self._observe(instruction_in)
+            if observed is None:
+                return index
+            path.append(index)
+            types.append(observed)
+            instruction_in.execute(prog)
+            index = prog._instruction_next_index
+
+            # Call is counted once as in compiled code
+            if type(instruction_in) is instruction.CALL:
+                prog._instructions_executed -= 1
+            if index == label_index:
+                break
+            if index >= count:
+                return index
+        else:
+            return index
+
+        try:
+            trace = self._compile_trace(path, types)
+        except _Unsupported:
+            return index
+
+        # Trace replaces closure of label, original closure is restored when trace is dropped
+        self.labels.setdefault(label_index, self.code[label_index])
+        self.code[label_index] = trace
+        self.hits[label_index] = 0
+        return index
+
+    def _observe(self, instruction_in):
+        # Types of values read by instruction, None if instruction is not traced
+        kind = type(instruction_in)
+        if kind not in _SUPPORTED:
+            return None
+        args = instruction_in.args
+
+        # Concatenation and reading of variable with string builder are left to compiled code
+        if kind is instruction.CONCAT and len(args) == 3 and args[1][0] == _VAR and args[1][1].frame == args[0][1].frame \
+                and args[1][1].name == args[0][1].name:
+            return None
+
+        if len(args) == 0 or kind in (instruction.JUMPIFEQ, instruction.JUMPIFNEQ) and len(args) == 1:
+            # Stack operands
+            operands = {instruction.CLEARS: 0, instruction.CREATEFRAME: 0, instruction.PUSHFRAME: 0, instruction.POPFRAME: 0,
+                instruction.RETURN: 0}.get(kind, 1 if kind in _UNARY else 2)
+            stack = self.prog._data_stack
+            if stack.top < operands:
+                return None
+            return tuple(type(value) for value in stack.items[stack.top - operands:stack.top])
+
+        observed = []
+        for arg in range(len(args)):
+            arg_type, value = args[arg]
+            if arg_type == _VAR and (arg > 0 or kind in (instruction.PUSHS, instruction.WRITE)):
+                frame = self._frame(value.frame)
+                if frame is None:
+                    return None
+                value = frame[value.slot]
+                if type(value) in _SPECIAL:
+                    return None
+            observed.append(type(value))
+        return tuple(observed)
+
+    def _frame(self, frame: str):
+        prog = self.prog
+        return {_GF: prog._frame_global, _LF: prog._frame_local, _TF: prog._frame_temp}[frame]
+
+    # --------------------------------------------
+    # Trace compilation
+
+    def _compile_trace(self, path: list, types: list):
+        prog = self.prog
+        source = _Source(path)
+        for position, (index, observed) in enumerate(zip(path, types)):
+            instruction_in = self.instructions[index]
+            successor = path[position + 1] if position + 1 < len(path) else path[0]
+            self._trace_instruction(source, position, index, instruction_in, observed, successor)
+        source.emit("iterations += 1")
+
+        # Leaving of trace counts its executed instructions, dispatch loop has counted label
+        length = len(path)
+        label_index = path[0]
+        code = self.code
+        entries = [0, 0]
+
+        def leave(iterations, position, index):
+            prog._instructions_fused += iterations * length + position - 1
+            entries[0] += 1
+            entries[1] += iterations
+            if entries[0] == _ENTRIES_CHECK and entries[1] < entries[0]:
+                code[label_index] = self.labels[label_index]
+            return index
+
+        names = ["prog", "stack", "items", "leave", "UNDEFINED", "UNINITIALIZED", "SPECIAL"] + list(source.values)
+        values = [prog, prog._data_stack, prog._data_stack.items, leave, program.UNDEFINED, program.UNINITIALIZED, _SPECIAL] \
+            + list(source.values.values())
+        text = "\n".join([
+            f"def factory({', '.join(names)}):",
+            "    def trace():",
+            "        gf = prog._frame_global",
+            "        lf = prog._frame_local",
+            "        tf = prog._frame_temp",
+            "        frames = prog._frame_stack",
+            "        calls = prog._call_stack",
+            "        iterations = 0",
+            "        while True:",
+        ] + ["    " + line for line in source.lines] + ["    return trace", ""])
+
+        namespace = {}
+        exec(compile(text, f"<trace {label_index}>", "exec"), namespace)
+        return namespace["factory"](*values)
+
+    def _trace_instruction(self, source: _Source, position: int, index: int, instruction_in, observed: tuple, successor: int):
+        kind = type(instruction_in)
+        args = instruction_in.args
+        stack_form = len(args) == 0 or kind in (instruction.JUMPIFEQ, instruction.JUMPIFNEQ) and len(args) == 1
+
+        if kind in (instruction.LABEL, instruction.JUMP):
+            pass
+
+        elif kind in _BINARY and not stack_form:
+            value1 = self._trace_read(source, args[1], observed[1], position)
+            value2 = self._trace_read(source, args[2], observed[2], position)
+            result = self._trace_binary(source, kind, value1, value2, observed[1], observed[2], position)
+            self._trace_write(source, args[0][1], result, position)
+
+        elif kind in _BINARY:
+            source.emit("top = stack.top")
+            source.guard("top < 2", position)
+            value1, value2 = source.temp(), source.temp()
+            source.emit(f"{value1} = items[top - 2]")
+            source.emit(f"{value2} = items[top - 1]")
+            self._trace_type_guard(source, value1, observed[0], position)
+            self._trace_type_guard(source, value2, observed[1], position)
+            result = self._trace_binary(source, kind, value1, value2, observed[0], observed[1], position)
+            source.emit(f"items[top - 2] = {result}")
+            source.emit("stack.top = top - 1")
+
+        elif kind in _UNARY and not stack_form:
+            value = self._trace_read(source, args[1], observed[1], position)
+            result = self._trace_unary(source, kind, value, observed[1], position)
+            self._trace_write(source, args[0][1], result, position)
+
+        elif kind in _UNARY:
+            source.emit("top = stack.top")
+            source.guard("top < 1", position)
+            value = source.temp()
+            source.emit(f"{value} = items[top - 1]")
+            self._trace_type_guard(source, value, observed[0], position)
+            source.emit(f"items[top - 1] = {self._trace_unary(source, kind, value, observed[0], position)}")
+
+        elif kind in (instruction.JUMPIFEQ, instruction.JUMPIFNEQ):
+            if stack_form:
+                source.emit("top = stack.top")
+                source.guard("top < 2", position)
+                value1, value2 = source.temp(), source.temp()
+                source.emit(f"{value1} = items[top - 2]")
+                source.emit(f"{value2} = items[top - 1]")
+                self._trace_type_guard(source, value1, observed[0], position)
+                self._trace_type_guard(source, value2, observed[1], position)
+                source.emit("stack.top = top - 2")
+                type1, type2 = observed
+            else:
+                value1 = self._trace_read(source, args[1], observed[1], position)
+                value2 = self._trace_read(source, args[2], observed[2], position)
+                type1, type2 = observed[1], observed[2]
+            equal = self._trace_equal(value1, value2, type1, type2)
+
+            # Branch of recorded direction stays in trace, other one leaves it after jump
+            label_index = args[0][1]
+            if label_index != index + 1:
+                jump = equal if kind is instruction.JUMPIFEQ else f"not ({equal})"
+                if successor == label_index:
+                    source.emit(f"if not ({jump}): {source.leave(position + 1, index + 1)}")
+                else:
+                    source.emit(f"if {jump}: {source.leave(position + 1, label_index)}")
+
+        elif kind is instruction.MOVE:
+            value = self._trace_read_plain(source, args[1], position)
+            self._trace_write(source, args[0][1], value, position)
+
+        elif kind is instruction.TYPE:
+            # Name of type or empty string of uninitialized variable, other values leave trace
+            if args[1][0] != _VAR:
+                result = source.value(instruction.TYPE_NAMES.get(observed[1], ""))
+            else:
+                var = args[1][1]
+                frame = source.frame(var.frame, position)
+                value = source.temp()
+                result = source.temp()
+                source.emit(f"{value} = {frame}[{var.slot}]")
+                source.emit(f"{result} = {source.value(instruction.TYPE_NAMES)}.get(type({value}))")
+                source.emit(f"if {result} is None:")
+                source.emit(f"    if {value} is not UNINITIALIZED: {source.leave(position, index)}")
+                source.emit(f"    {result} = ''")
+            self._trace_write(source, args[0][1], result, position)
+
+        elif kind is instruction.PUSHS:
+            value = self._trace_read_plain(source, args[0], position)
+            source.emit("top = stack.top")
+            source.emit(f"if top == len(items): stack.grow()")
+            source.emit(f"items[top] = {value}")
+            source.emit("stack.top = top + 1")
+
+        elif kind is instruction.POPS:
+            source.emit("top = stack.top")
+            source.guard("top < 1", position)
+            self._trace_write(source, args[0][1], "items[top - 1]", position, "stack.top = top - 1")
+
+        elif kind is instruction.CLEARS:
+            source.emit("stack.top = 0")
+
+        elif kind is instruction.DEFVAR:
+            var = args[0][1]
+            frame = source.frame(var.frame, position)
+            source.guard(f"{frame}[{var.slot}] is not UNDEFINED", position)
+            source.emit(f"{frame}[{var.slot}] = UNINITIALIZED")
+
+        elif kind is instruction.CREATEFRAME:
+            source.emit(f"tf = prog._frame_temp = {source.value([program.UNDEFINED] * len(self.prog._slots_local))}.copy()")
+            source.checked[_TF] = True
+
+        elif kind is instruction.PUSHFRAME:
+            source.frame(_TF, position)
+            source.emit("if lf is not None: frames.append(lf)")
+            source.emit("lf = prog._frame_local = tf")
+            source.emit("tf = prog._frame_temp = None")
+            source.checked[_LF] = True
+            source.checked[_TF] = False
+
+        elif kind is instruction.POPFRAME:
+            source.frame(_LF, position)
+            source.emit("tf = prog._frame_temp = lf")
+            source.emit("lf = prog._frame_local = frames.pop() if frames else None")
+            source.checked[_LF] = False
+            source.checked[_TF] = True
+
+        elif kind is instruction.CALL:
+            source.emit(f"calls.append({index + 1})")
+
+        elif kind is instruction.RETURN:
+            # Return stays in trace only to recorded instruction
+            source.guard(f"not calls or calls[-1] != {successor}", position)
+            source.emit("calls.pop()")
+
+        elif kind is instruction.WRITE:
+            if args[0][0] != _VAR:
+                text = source.value(instruction.value_str(args[0][1]))
+            else:
+                text = f"{source.value(instruction.value_str)}({self._trace_read_plain(source, args[0], position)})"
+            source.emit(f"{source.value(self.prog.output_write)}({text})")
+
+        elif kind is instruction.READ:
+            read_type = _READ_TYPES.get(args[1][1])
+            if read_type is None:
+                raise _Unsupported
+            self._trace_write(source, args[0][1], f"{source.value(self.prog.input_read)}({source.value(read_type)})", position)
+
+        else:
+            raise _Unsupported
+
+    def _trace_read(self, source: _Source, symb, value_type, position: int) -> str:
+        # Value of symbol with type recorded for it
+        if symb[0] != _VAR:
+            return source.value(symb[1])
+        var = symb[1]
+        frame = source.frame(var.frame, position)
+        value = source.temp()
+        source.emit(f"{value} = {frame}[{var.slot}]")
+        self._trace_type_guard(source, value, value_type, position)
+        return value
+
+    def _trace_read_plain(self, source: _Source, symb, position: int) -> str:
+        # Value of symbol of any type
+        if symb[0] != _VAR:
+            return source.value(symb[1])
+        var = symb[1]
+        frame = source.frame(var.frame, position)
+        value = source.temp()
+        source.emit(f"{value} = {frame}[{var.slot}]")
+        source.guard(f"type({value}) in SPECIAL", position)
+        return value
+
+    def _trace_type_guard(self, source: _Source, value: str, value_type, position: int):
+        if value_type is type(None):
+            source.guard(f"{value} is not None", position)
+        else:
+            source.guard(f"type({value}) is not {source.value(value_type)}", position)
+
+    def _trace_write(self, source: _Source, var, result: str, position: int, before: str = None):
+        # Variable has to be defined, guards of instruction are before its first change of state
+        frame = source.frame(var.frame, position)
+        source.guard(f"{frame}[{var.slot}] is UNDEFINED", position)
+        if before is not None:
+            result_name = source.temp()
+            source.emit(f"{result_name} = {result}")
+            source.emit(before)
+            result = result_name
+        source.emit(f"{frame}[{var.slot}] = {result}")
+
+    def _trace_equal(self, value1: str, value2: str, type1, type2) -> str:
+        # Equality of values of recorded types, values of other types than nil are not compared
+        if type1 is type2:
+            return f"{value1} == {value2}"
+        if type1 is type(None) or type2 is type(None):
+            return "False"
+        raise _Unsupported
+
+    def _trace_binary(self, source: _Source, kind, value1: str, value2: str, type1, type2, position: int) -> str:
+        # Expression of operation result, operands which would be error leave trace before it
+        if kind in (instruction.ADD, instruction.SUB, instruction.MUL):
+            if type1 is not type2 or type1 not in (int, float):
+                raise _Unsupported
+            return f"{value1} {dict([(instruction.ADD, '+'), (instruction.SUB, '-'), (instruction.MUL, '*')])[kind]} {value2}"
+        if kind in (instruction.DIV, instruction.IDIV):
+            if type1 is not type2 or type1 is not (float if kind is instruction.DIV else int):
+                raise _Unsupported
+            source.guard(f"{value2} == 0", position)
+            return f"{value1} {'/' if kind is instruction.DIV else '//'} {value2}"
+        if kind in (instruction.LT, instruction.GT):
+            if type1 is not type2 or type1 is type(None):
+                raise _Unsupported
+            return f"{value1} {'<' if kind is instruction.LT else '>'} {value2}"
+        if kind is instruction.EQ:
+            return self._trace_equal(value1, value2, type1, type2)
+        if kind in (instruction.AND, instruction.OR):
+            if type1 is not bool or type2 is not bool:
+                raise _Unsupported
+            return f"{value1} {'and' if kind is instruction.AND else 'or'} {value2}"
+        if kind in (instruction.STRI2INT, instruction.GETCHAR):
+            if type1 is not str or type2 is not int:
+                raise _Unsupported
+            source.guard(f"not 0 <= {value2} < len({value1})", position)
+            return f"ord({value1}[{value2}])" if kind is instruction.STRI2INT else f"{value1}[{value2}]"
+        if kind is instruction.CONCAT:
+            if type1 is not str or type2 is not str:
+                raise _Unsupported
+            return f"{value1} + {value2}"
+        raise _Unsupported
+
+    def _trace_unary(self, source: _Source, kind, value: str, value_type, position: int) -> str:
+        if kind is instruction.NOT and value_type is bool:
+            return f"not {value}"
+        if kind is instruction.INT2CHAR and value_type is int:
+            source.guard(f"not 0 <= {value} <= 0x10FFFF", position)
+            return f"chr({value})"
+        if kind is instruction.INT2FLOAT and value_type is int:
+            source.guard(f"not -{_FLOAT_LIMIT} < {value} < {_FLOAT_LIMIT}", position)
+            return f"float({value})"
+        if kind is instruction.FLOAT2INT and value_type is float:
+            source.guard(f"not -{source.value(float('inf'))} < {value} < {source.value(float('inf'))}", position)
+            return f"int({value})"
+        if kind is instruction.STRLEN and value_type is str:
+            return f"len({value})"
+        raise _Unsupported
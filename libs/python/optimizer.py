@@ -0,0 +1,189 @@
+# IPP 2023, project 2
+# Author: Marek Gergel, xgerge01
+# File: optimizer.py
+# Description: Peephole optimization of code instructions to fused instructions
+# Date: 2023-04-07
+
+from . import instruction,program
+
+# Stack operations with two operands, which have same three address variant
+_STACK_OPERATIONS = (instruction.ADD, instruction.SUB, instruction.MUL, instruction.DIV, instruction.IDIV, instruction.LT, instruction.GT,
+    instruction.EQ, instruction.AND, instruction.OR, instruction.STRI2INT)
+
+_COMPARISONS = (instruction.LT, instruction.GT, instruction.EQ)
+
+# --------------------------------------------
+# Fused instructions replace first instruction of sequence, other instructions of sequence are kept
+# on their indexes, so jumps and calls to them still work
+
+class Fused(instruction.Instruction):
+
+    def __init__(self, instructions: list):
+        first = instructions[0]
+        super().__init__(first.opcode, first.args, first.order)
+        self.instructions = instructions
+
+class PUSHS_OP_POPS(Fused):
+
+    # PUSHS a; PUSHS b; OPS; POPS c -> OP c a b
+    def __init__(self, instructions: list):
+        super().__init__(instructions)
+        push1, push2, operation, pop = instructions
+        self.operation = type(operation)(operation.opcode, {0: pop.args[0], 1: push1.args[0], 2: push2.args[0]}, operation.order)
+
+    def execute(self, prog: program.Program):
+        self.operation.execute(prog)
+        prog._instructions_executed += 3
+        prog._instruction_next_index += 3
+
+class COMPARE_JUMP(Fused):
+
+    # LT/GT/EQ var a b; JUMPIFEQ/JUMPIFNEQ label var bool
+    def __init__(self, instructions: list):
+        super().__init__(instructions)
+        self.compare, jump = instructions
+        self.var = self.compare.args[0][1]
+        self.label_index = jump.args[0][1]
+        constant = jump.args[2] if jump.args[1][0] == program.Program.DataType.VAR else jump.args[1]
+        self.jump_on = constant[1] if isinstance(jump, instruction.JUMPIFEQ) else not constant[1]
+
+    def execute(self, prog: program.Program):
+        self.compare.execute(prog)
+        if prog.var_get(self.var, True) == self.jump_on:
+            prog.instruction_counter_set(self.label_index)
+        else:
+            prog.instruction_counter_inc()
+
+class CREATEFRAME_PUSHFRAME(Fused):
+
+    def execute(self, prog: program.Program):
+        prog.frame_create()
+        prog.frame_push()
+        prog._instructions_executed += 2
+        prog._instruction_next_index += 2
+
+class CALL_FRAME(Fused):
+
+    # CREATEFRAME; (DEFVAR TF@x; MOVE TF@x symb)*; CALL label, arguments are set directly to slots of new frame
+    def __init__(self, instructions: list):
+        super().__init__(instructions)
+        self.params = [(move.args[0][1], move.args[1]) for move in instructions[2:-1:2]]
+        self.label_index = instructions[-1].args[0][1]
+
+    def execute(self, prog: program.Program):
+        prog.frame_create()
+        if prog._vars_tracking:
+            for var, symb in self.params:
+                prog.var_define(var)
+                prog.var_set(var, instruction._get_value(prog, symb, True))
+        else:
+            frame = prog._frame_temp
+            for var, symb in self.params:
+                frame[var.slot] = instruction._get_value(prog, symb, True)
+
+        # Return to instruction after call
+        count = len(self.instructions)
+        prog._instructions_executed += count
+        prog.call_stack_push(prog._instruction_next_index + count)
+        prog._instruction_next_index = self.label_index
+
+class LABEL_PUSHFRAME(Fused):
+
+    def execute(self, prog: program.Program):
+        prog.frame_push()
+        prog._instructions_executed += 2
+        prog._instruction_next_index += 2
+
+class POPFRAME_RETURN(Fused):
+
+    def execute(self, prog: program.Program):
+        prog.frame_pop()
+        prog._instructions_executed += 1
+        prog.instruction_counter_set(prog.call_stack_pop())
+
+# --------------------------------------------
+
+class Optimizer:
+
+    def __init__(self, prog: program.Program):
+        self.prog = prog
+
+    def optimize(self):
+        instructions = self.prog._instructions
+        index = 0
+        while index < len(instructions):
+            fused = self.fuse(instructions, index)
+            if fused is None:
+                index += 1
+                continue
+            instructions[index] = fused
+            index += len(fused.instructions)
+
+    def fuse(self, instructions: list, index: int):
+        # Fused instruction starting on index, None if sequence on index is not fused
+        sequence = instructions[index:index + 4]
+        kinds = [type(instruction_in) for instruction_in in sequence]
+
+        if kinds[:2] == [instruction.CREATEFRAME, instruction.PUSHFRAME]:
+            return CREATEFRAME_PUSHFRAME(sequence[:2])
+
+        if kinds[:2] == [instruction.POPFRAME, instruction.RETURN]:
+            return POPFRAME_RETURN(sequence[:2])
+
+        if kinds[:2] == [instruction.LABEL, instruction.PUSHFRAME]:
+            return LABEL_PUSHFRAME(sequence[:2])
+
+        if kinds[:1] == [instruction.CREATEFRAME]:
+            length = self._call_length(instructions, index)
+            if length:
+                return CALL_FRAME(instructions[index:index + length])
+
+        if len(sequence) == 4 and kinds[0] == kinds[1] == instruction.PUSHS and kinds[2] in _STACK_OPERATIONS \
+                and len(sequence[2].args) == 0 and kinds[3] == instruction.POPS:
+            return PUSHS_OP_POPS(sequence)
+
+        if len(sequence) >= 2 and kinds[0] in _COMPARISONS and len(sequence[0].args) == 3 \
+                and kinds[1] in (instruction.JUMPIFEQ, instruction.JUMPIFNEQ) and self._jumps_on_result(sequence[0], sequence[1]):
+            return COMPARE_JUMP(sequence[:2])
+
+        return None
+
+    def _call_length(self, instructions: list, index: int) -> int:
+        # Length of sequence CREATEFRAME; (DEFVAR TF@x; MOVE TF@x symb)*; CALL label, 0 if there is none
+        names = set()
+        end = index + 1
+        while end + 1 < len(instructions) and type(instructions[end]) == instruction.DEFVAR and type(instructions[end + 1]) == instruction.MOVE:
+            var = instructions[end].args[0][1]
+            dest = instructions[end + 1].args[0][1]
+            # Redefinition of argument is error of DEFVAR and argument set to itself is error of MOVE, they are not fused
+            if var.frame != program.Program._Frame.TF or dest.frame != var.frame or dest.name != var.name or var.name in names:
+                return 0
+            symb = instructions[end + 1].args[1]
+            if symb[0] == program.Program.DataType.VAR and symb[1].frame == var.frame and symb[1].name == var.name:
+                return 0
+            names.add(var.name)
+            end += 2
+        if end < len(instructions) and type(instructions[end]) == instruction.CALL:
+            return end - index + 1
+        return 0
+
+    def _jumps_on_result(self, compare, jump) -> bool:
+        # Jump compares result variable of comparison with bool constant
+        if len(jump.args) != 3:
+            return False
+        var = compare.args[0][1]
+        for symb, other in ((jump.args[1], jump.args[2]), (jump.args[2], jump.args[1])):
+            if symb[0] == program.Program.DataType.VAR and symb[1].frame == var.frame and symb[1].name == var.name and other[0] == bool:
+                return True
+        return False
+
+def counts_original(instructions: list, counts: list) -> tuple:
+    # Instructions and execution counts before optimization, every instruction of fused sequence is executed
+    instructions = list(instructions)
+    counts = list(counts)
+    for index, instruction_in in enumerate(instructions):
+        if isinstance(instruction_in, Fused):
+            instructions[index] = instruction_in.instructions[0]
+            for offset in range(1, len(instruction_in.instructions)):
+                counts[index + offset] += counts[index]
+    return instructions, counts
@@ -4,19 +4,78 @@
 # Description: Script parameter parsing
 # Date: 2023-04-07
 
-from . import error
+from . import cache,error
 import argparse,sys
 
 source=None
+source_format=None
 input=None
+output=None
+engine=None
+cache_dir=None
+compile_only=False
+profile=None
+batch=None
+batch_output=None
+optimize=True
+stats=[]
+image=None
+image_out=None
+
+# Statistics parameters, order of them is order of values in file
+_STATS_ACTIONS = ('--insts', '--hot', '--vars', '--frequent', '--print', '--eol')
+
+def _parse_stats(argv: list) -> tuple:
+    # Split statistics groups from other parameters, argparse would lose their order
+    groups = []
+    remaining = []
+    index = 0
+    while index < len(argv):
+        arg = argv[index]
+        name, has_value, value = arg.partition('=')
+        index += 1
+
+        if name not in ('--stats',) + _STATS_ACTIONS:
+            remaining.append(arg)
+            continue
+
+        # Value of '--stats' and '--print' has to be joined by '=', next parameter would be taken as value
+        if name in ('--stats', '--print') and not has_value:
+            error.exit(error.code.ERR_PARAMS, f'Parameter \'{name}\' requires value ({name}=value)\n')
+        elif name not in ('--stats', '--print') and has_value:
+            error.exit(error.code.ERR_PARAMS, f'Parameter \'{name}\' does not take value\n')
+
+        if name == '--stats':
+            if value in (file for file, actions in groups):
+                error.exit(error.code.ERR_OUTPUT, f'Statistics file \'{value}\' is used more than once\n')
+            groups.append((value, []))
+        elif not groups:
+            error.exit(error.code.ERR_PARAMS, f'Parameter \'{name}\' requires preceding \'--stats\'\n')
+        else:
+            groups[-1][1].append((name[2:], value))
+
+    return groups, remaining
 
 def parse():
     parser = argparse.ArgumentParser(description='Interpret script for IPPcode23 in XML format', add_help=False,)
     parser.add_argument('--source', metavar='filename', type=str, help='the source file with the source code IPPcode23 in XML format')
+    parser.add_argument('--source-format', choices=['xml', 'ippcode'], default='xml', help='format of the source file, XML representation or IPPcode23 source code')
     parser.add_argument('--input', metavar='filename', type=str, help='the input file with input data')
+    parser.add_argument('--output', metavar='filename', type=str, help='the output file for program output (standard output by default)')
+    parser.add_argument('--engine', choices=['interpret', 'compiled', 'jit'], default='interpret', help='execution engine, instructions are interpreted or compiled to closures (jit also compiles hot loops to Python functions)')
+    parser.add_argument('--cache-dir', metavar='dirname', type=str, nargs='?', const=cache.DEFAULT_DIR, help=f'cache validated programs in directory (default {cache.DEFAULT_DIR})')
+    parser.add_argument('--compile-only', action='store_true', help='only validate source and store it to cache')
+    parser.add_argument('--image', metavar='filename', type=str, help='load program from bytecode image instead of source file')
+    parser.add_argument('--image-out', metavar='filename', type=str, help='write bytecode image of validated program to file')
+    parser.add_argument('--profile', metavar='filename', type=str, help='write execution profile of opcodes, instructions and labels to file (and JSON to filename.json)')
+    parser.add_argument('--batch', metavar='path', type=str, help='run program with every input file from manifest or directory with \'*.in\' files')
+    parser.add_argument('--batch-output', metavar='dirname', type=str, help='directory for output and exit code of every batch run')
+    parser.add_argument('-O', metavar='level', dest='optimize', choices=['0', '1'], default='1', help='optimization level, -O1 fuses common instruction sequences (default), -O0 turns it off')
     parser.add_argument('--help', action='store_true', help='show this help message and exit')
+    parser.epilog = 'statistics: --stats=filename followed by any of --insts, --hot, --vars, --frequent, --print=string, --eol'
 
-    args = parser.parse_args()
+    groups, remaining = _parse_stats(sys.argv[1:])
+    args = parser.parse_args(remaining)
     if args.help:
         if len(sys.argv) == 2:
             parser.print_help()
@@ -24,17 +83,62 @@ def parse():
         else:
             error.exit(error.code.ERR_PARAMS, 'Parameter \'--help\' must be used alone\n')
 
-    if not args.source and not args.input:
+    if not args.source and not args.input and not args.batch and not args.image:
         error.exit(error.code.ERR_PARAMS, 'Parameter \'--source\' or \'--input\' have to be specified\n')
 
+    if args.image and (args.source or args.cache_dir or args.compile_only or args.image_out):
+        error.exit(error.code.ERR_PARAMS, 'Parameter \'--image\' cannot be used with \'--source\', \'--cache-dir\', \'--compile-only\' or \'--image-out\'\n')
+
+    if args.batch and (args.input or args.output):
+        error.exit(error.code.ERR_PARAMS, 'Parameter \'--batch\' cannot be used with \'--input\' or \'--output\'\n')
+    if bool(args.batch) != bool(args.batch_output):
+        error.exit(error.code.ERR_PARAMS, 'Parameters \'--batch\' and \'--batch-output\' have to be used together\n')
+    if args.batch and groups:
+        error.exit(error.code.ERR_PARAMS, 'Parameter \'--batch\' cannot be used with \'--stats\'\n')
+
     global source
     if args.source:
         source = args.source
     else:
         source = sys.stdin
 
+    global source_format
+    source_format = args.source_format
+
     global input
     if args.input:
         input = args.input
     else:
         input = sys.stdin
+
+    global engine
+    engine = args.engine
+
+    global cache_dir
+    global compile_only
+    cache_dir = args.cache_dir
+    compile_only = args.compile_only
+    if compile_only and cache_dir is None:
+        cache_dir = cache.DEFAULT_DIR
+
+    global batch
+    global batch_output
+    batch = args.batch
+    batch_output = args.batch_output
+
+    global output
+    output = args.output
+
+    global profile
+    profile = args.profile
+
+    global optimize
+    optimize = args.optimize == '1'
+
+    global stats
+    stats = groups
+
+    global image
+    global image_out
+    image = args.image
+    image_out = args.image_out
@@ -5,8 +5,11 @@
 # Date: 2023-04-07
 
 from . import error,instruction,program
-from collections import Counter
 import xml.etree.ElementTree as et
+import re
+
+# Escape sequence in string constant (\ddd)
+_STRING_ESCAPE = re.compile(rb"\\(\d{1,3})")
 
 # XML structure class with constants
 class _XML:
@@ -60,103 +63,141 @@ class Parser:
             self.source_file.close()
 
     def parseXML(self, prog: program.Program):
-        # Parse xml structure
+        root = None
+        depth = 0
+        records = []
+
+        # Parse xml structure as stream, only lightweight record of every instruction is kept
         try:
-            tree = et.parse(self.source_file)
+            for event, elem in et.iterparse(self.source_file, events=("start", "end")):
+                if event == "start":
+                    if root is None:
+                        root = elem
+                    depth += 1
+                    continue
+
+                depth -= 1
+                if depth == 1:
+                    records.append(self._get_record(elem))
+                    root.remove(elem)
         except:
             error.exit(error.code.ERR_XML_FORMAT, "XML structure is not valid\n")
 
-        # Get root element
-        root = tree.getroot()
-
         # Check root element (program)
         if root.tag != _XML.Elem.program:
             error.exit(error.code.ERR_XML_SYNTAX, "Root element is not 'program'\n")
-        if root.attrib[_XML.Attr.language].upper() != _XML.AttrValue.IPPCODE23:
+        if root.attrib.get(_XML.Attr.language, "").upper() != _XML.AttrValue.IPPCODE23:
             error.exit(error.code.ERR_XML_SYNTAX, "Code language is not 'IPPcode23'\n")
 
         # Check order attribute of child elements (instructions)
         try:
-            values = [int(child.attrib[_XML.Attr.order]) for child in root]
+            records = [(int(order), record) for order, *record in records]
         except:
             error.exit(error.code.ERR_XML_SYNTAX, "Order attribute does not exist\n")
 
-        if any(not isinstance(value, int) for value in values):
-            error.exit(error.code.ERR_XML_SYNTAX, "Order attribute value is not integer\n")
-        if any(value < 1 for value in values):
+        if any(order < 1 for order, record in records):
             error.exit(error.code.ERR_XML_SYNTAX, "Order attribute value is less than 1\n")
-        duplicates = [value for value, count in Counter(values).items() if count > 1]
-        if duplicates:
+        if len(set(order for order, record in records)) != len(records):
             error.exit(error.code.ERR_XML_SYNTAX, "Order attribute value is not unique\n")
 
         # Sort child elements (instructions) by order attribute
-        root[:] = sorted(root, key=lambda child: int(child.attrib[_XML.Attr.order]))
+        records.sort(key=lambda record: record[0])
+        self._load(prog, records)
+
+    def _load(self, prog: program.Program, records: list):
+        # Create instructions of sorted records (order, tag, opcode, arguments) and resolve their labels
+        for order, record in records:
+            instruction_in = self._parse_instruction(*record)
+            instruction_in.order = order
 
-        # Check child elements (instructions)
-        for child in root:
-            instruction_in = self._parse_instruction(child)
-            
             # Set label
             if isinstance(instruction_in, instruction.LABEL):
                 # Label multiple definition
                 if prog.label_is_defined(instruction_in.args[0][1]):
                     error.exit(error.code.ERR_XML_SEMANTIC, "Label already defined\n")
                 prog.label_create(instruction_in.args[0][1])
-                
+
             # Add instruction to program
             prog.instruction_add(instruction_in)
 
-    def _parse_instruction(self, root) -> instruction.Instruction:
+        # Resolve labels to instruction indexes
+        self._link(prog)
+
+    def _link(self, prog: program.Program):
+        for instruction_in in prog._instructions:
+            if isinstance(instruction_in, (instruction.JUMP, instruction.CALL, instruction.JUMPIFEQ, instruction.JUMPIFNEQ)):
+                label_type, label = instruction_in.args[0]
+                if not prog.label_is_defined(label):
+                    error.exit(error.code.ERR_XML_SEMANTIC, f"Label '{label}' is not defined\n")
+                instruction_in.args[0] = label_type, prog.label_get_index(label)
 
-        if root.tag != _XML.Elem.instruction:
-            error.exit(error.code.ERR_XML_SYNTAX, f"Invalid instruction element '{root.tag}'\n")
+    def _get_record(self, elem) -> tuple:
+        # Order, tag, opcode and arguments (tag, type, text) of instruction element
+        return elem.attrib.get(_XML.Attr.order), elem.tag, elem.attrib.get(_XML.Attr.opcode), \
+            [(arg.tag, arg.attrib.get(_XML.Attr.type), arg.text) for arg in elem]
+
+    def _parse_instruction(self, tag, opcode, arguments) -> instruction.Instruction:
+
+        if tag != _XML.Elem.instruction:
+            error.exit(error.code.ERR_XML_SYNTAX, f"Invalid instruction element '{tag}'\n")
 
         # Collect instruction arguments
-        arg_count = len(root.findall("*"))
+        arg_count = len(arguments)
+        arguments = {arg_tag: (arg_type, arg_text) for arg_tag, arg_type, arg_text in reversed(arguments)}
         args = {}
 
         if arg_count > 0:
             try:
-                arg = root.find(_XML.Elem.arg1)
-                args[0] = self._get_data_type(arg.attrib[_XML.Attr.type]), arg.text
+                arg_type, arg_text = arguments[_XML.Elem.arg1]
+                args[0] = self._get_data_type(arg_type), arg_text
             except:
                 error.exit(error.code.ERR_XML_SYNTAX, f"Invalid argument element, '{_XML.Elem.arg1}' does not exist\n")
 
             if arg_count > 1:
                 try:
-                    arg = root.find(_XML.Elem.arg2)
-                    args[1] = self._get_data_type(arg.attrib[_XML.Attr.type]), arg.text
+                    arg_type, arg_text = arguments[_XML.Elem.arg2]
+                    args[1] = self._get_data_type(arg_type), arg_text
                 except:
                     error.exit(error.code.ERR_XML_SYNTAX, f"Invalid argument element, '{_XML.Elem.arg2}' does not exist\n")
 
                 if arg_count > 2:
                     try:
-                        arg = root.find(_XML.Elem.arg3)
-                        args[2] = self._get_data_type(arg.attrib[_XML.Attr.type]), arg.text
+                        arg_type, arg_text = arguments[_XML.Elem.arg3]
+                        args[2] = self._get_data_type(arg_type), arg_text
                     except:
                         error.exit(error.code.ERR_XML_SYNTAX, f"Invalid argument element, '{_XML.Elem.arg3}' does not exist\n")
 
                     if arg_count > 3:
                         error.exit(error.code.ERR_XML_SYNTAX, f"Invalid instruction element, too many arguments\n")
 
+        # Resolve variable references and decode constants
+        for index, (arg_type, arg_value) in args.items():
+            if arg_type == program.Program.DataType.VAR:
+                var = program.Program.Variable.from_str(arg_value)
+                if var is None:
+                    error.exit(error.code.ERR_XML_SYNTAX, f"Invalid variable '{arg_value}'\n")
+                args[index] = arg_type, var
+            elif arg_type is not None:
+                args[index] = arg_type, self._get_constant_value(arg_type, arg_value)
+
         # Create instruction
         try:
-            opcode = root.attrib[_XML.Attr.opcode].upper()
+            opcode = opcode.upper()
         except:
             error.exit(error.code.ERR_XML_SYNTAX, "Opcode attribute does not exist\n")
 
         match arg_count:
             case 0:
-                if opcode not in ["CREATEFRAME", "PUSHFRAME", "POPFRAME", "RETURN", "BREAK", "CLEARS", "ADDS", "SUBS", "MULS", "IDIVS", "LTS", "GTS", "EQS", "ANDS", "ORS", "NOTS", "INT2CHARS", "STRI2INTS"]:
+                if opcode not in ["CREATEFRAME", "PUSHFRAME", "POPFRAME", "RETURN", "BREAK", "CLEARS", "ADDS", "SUBS", "MULS", "IDIVS", "LTS", "GTS", "EQS", "ANDS", "ORS", "NOTS", "INT2CHARS", "STRI2INTS", "DIVS", "INT2FLOATS", "FLOAT2INTS"]:
                     error.exit(error.code.ERR_XML_SYNTAX, f"Invalid instruction '{opcode}' with {arg_count} arguments\n")
             case 1:
                 if opcode not in ["DEFVAR", "CALL", "PUSHS", "POPS", "WRITE", "LABEL", "JUMP", "EXIT", "DPRINT" , "JUMPIFEQS", "JUMPIFNEQS"]:
                     error.exit(error.code.ERR_XML_SYNTAX, f"Invalid instruction '{opcode}' with {arg_count} arguments\n")
             case 2:
-                if opcode not in ["MOVE", "NOT", "INT2CHAR", "READ", "STRLEN", "TYPE"]:
+                if opcode not in ["MOVE", "NOT", "INT2CHAR", "READ", "STRLEN", "TYPE", "INT2FLOAT", "FLOAT2INT"]:
                     error.exit(error.code.ERR_XML_SYNTAX, f"Invalid instruction '{opcode}' with {arg_count} arguments\n")
             case 3:
-                if opcode not in ["ADD", "SUB", "MUL", "IDIV", "LT", "GT", "EQ", "AND", "OR", "STRI2INT", "CONCAT", "GETCHAR", "SETCHAR", "JUMPIFEQ", "JUMPIFNEQ"]:
+                if opcode not in ["ADD", "SUB", "MUL", "DIV", "IDIV", "LT", "GT", "EQ", "AND", "OR", "STRI2INT", "CONCAT", "GETCHAR", "SETCHAR", "JUMPIFEQ", "JUMPIFNEQ"]:
                     error.exit(error.code.ERR_XML_SYNTAX, f"Invalid instruction '{opcode}' with {arg_count} arguments\n")
 
         match opcode:
@@ -184,6 +225,8 @@ class Parser:
                 return instruction.SUB(opcode, args)
             case "MUL" | "MULS":
                 return instruction.MUL(opcode, args)
+            case "DIV" | "DIVS":
+                return instruction.DIV(opcode, args)
             case "IDIV" | "IDIVS":
                 return instruction.IDIV(opcode, args)
             case "LT" | "LTS":
@@ -202,6 +245,10 @@ class Parser:
                 return instruction.INT2CHAR(opcode, args)
             case "STRI2INT" | "STRI2INTS":
                 return instruction.STRI2INT(opcode, args)
+            case "INT2FLOAT" | "INT2FLOATS":
+                return instruction.INT2FLOAT(opcode, args)
+            case "FLOAT2INT" | "FLOAT2INTS":
+                return instruction.FLOAT2INT(opcode, args)
             case "READ":
                 return instruction.READ(opcode, args)
             case "WRITE":
@@ -255,3 +302,29 @@ class Parser:
                 return None
             case _: # Should never happen
                 error.exit(error.code.ERR_XML_SYNTAX, f"Unknown data type '{value_type}'\n")
+
+    def _get_constant_value(self, value_type, string: str):
+        if value_type == str:
+            if string == None:
+                return ""
+            return _STRING_ESCAPE.sub(lambda m: bytes([int(m.group(1))]), string.encode()).decode()
+        elif value_type == bool:
+            if string and string.lower() == 'true':
+                return True
+            elif string and string.lower() == 'false':
+                return False
+            else:
+                error.exit(error.code.ERR_XML_SYNTAX, f"Value '{string}' is not valid BOOL value\n")
+        elif value_type == int:
+            try:
+                return int(string)
+            except (TypeError, ValueError):
+                error.exit(error.code.ERR_XML_SYNTAX, f"Value '{string}' is not valid INT value\n")
+        elif value_type == float:
+            # Float constant is in hexadecimal notation (0x1.8p+1)
+            try:
+                return float.fromhex(string)
+            except (TypeError, ValueError, OverflowError):
+                error.exit(error.code.ERR_XML_SYNTAX, f"Value '{string}' is not valid FLOAT value\n")
+        else:
+            return None
@@ -0,0 +1,171 @@
+# IPP 2023, project 2
+# Author: Marek Gergel, xgerge01
+# File: profiler.py
+# Description: Profiling of executed instructions
+# Date: 2023-04-07
+
+from . import compiler,error,instruction,program
+import json,time
+
+class Profiler:
+
+    def __init__(self, prog: program.Program, path: str = None, compiler_i: compiler.Compiler = None):
+        self.prog = prog
+        self.path = path
+        self.compiler = compiler_i
+
+        # Execution count and time (ns) of every instruction, without path only counts (statistics)
+        count = prog.instructions_count()
+        self.counts = [0] * count
+        self.times = [0] * count
+
+    def execute(self):
+        # Instrumented loop replaces loop of engine, so profiling costs nothing when it is off
+        try:
+            if self.compiler is None:
+                self._execute_instructions() if self.path is not None else self._count_instructions()
+            else:
+                self._execute_compiled() if self.path is not None else self._count_compiled()
+        finally:
+            self.prog.output_flush()
+            if self.path is not None:
+                self.write()
+
+    def _execute_instructions(self):
+        prog = self.prog
+        instructions = prog._instructions
+        count = len(instructions)
+        counts = self.counts
+        times = self.times
+        clock = time.perf_counter_ns
+
+        while prog._instruction_next_index < count:
+            index = prog._instruction_next_index
+            start = clock()
+            instructions[index].execute(prog)
+            times[index] += clock() - start
+            counts[index] += 1
+
+    def _execute_compiled(self):
+        prog = self.prog
+        code = self.compiler.code_get()
+        count = len(code)
+        counts = self.counts
+        times = self.times
+        clock = time.perf_counter_ns
+        index = prog.instruction_counter_get()
+        executed = prog._instructions_executed
+
+        try:
+            while index < count:
+                start = clock()
+                executed += 1
+                try:
+                    index_next = code[index]()
+                except compiler._Sync as sync:
+                    prog._instruction_next_index = sync.index + 1
+                    prog._instructions_executed = executed
+                    index_next = sync.action()
+                times[index] += clock() - start
+                counts[index] += 1
+                index = index_next
+        finally:
+            prog._instruction_next_index = index
+            prog._instructions_executed = executed
+
+    def _count_instructions(self):
+        prog = self.prog
+        instructions = prog._instructions
+        count = len(instructions)
+        counts = self.counts
+
+        while prog._instruction_next_index < count:
+            index = prog._instruction_next_index
+            instructions[index].execute(prog)
+            counts[index] += 1
+
+    def _count_compiled(self):
+        prog = self.prog
+        code = self.compiler.code_get()
+        count = len(code)
+        counts = self.counts
+        index = prog.instruction_counter_get()
+        executed = prog._instructions_executed
+
+        try:
+            while index < count:
+                executed += 1
+                try:
+                    index_next = code[index]()
+                except compiler._Sync as sync:
+                    prog._instruction_next_index = sync.index + 1
+                    prog._instructions_executed = executed
+                    index_next = sync.action()
+                counts[index] += 1
+                index = index_next
+        finally:
+            prog._instruction_next_index = index
+            prog._instructions_executed = executed
+
+    def _regions(self) -> list:
+        # Name of label region (nearest preceding label) of every instruction
+        regions = []
+        region = "<start>"
+        for instruction_in in self.prog._instructions:
+            if isinstance(instruction_in, instruction.LABEL):
+                region = instruction_in.args[0][1]
+            regions.append(region)
+        return regions
+
+    def report(self) -> dict:
+        opcodes = {}
+        regions = {}
+        instructions = []
+
+        for index, (instruction_in, region) in enumerate(zip(self.prog._instructions, self._regions())):
+            count = self.counts[index]
+            if count == 0:
+                continue
+            opcode = type(instruction_in).__name__
+
+            stats = opcodes.setdefault(opcode, {"opcode": opcode, "count": 0, "time_ns": 0})
+            stats["count"] += count
+            stats["time_ns"] += self.times[index]
+
+            stats = regions.setdefault(region, {"label": region, "count": 0, "time_ns": 0})
+            stats["count"] += count
+            stats["time_ns"] += self.times[index]
+
+            instructions.append({"order": instruction_in.order, "opcode": instruction_in.opcode, "label": region, "count": count, "time_ns": self.times[index]})
+
+        def by_time(stats):
+            return sorted(stats, key=lambda item: (-item["time_ns"], -item["count"]))
+
+        return {
+            "count": sum(self.counts),
+            "time_ns": sum(self.times),
+            "opcodes": by_time(opcodes.values()),
+            "labels": by_time(regions.values()),
+            "instructions": by_time(instructions),
+        }
+
+    def write(self):
+        report = self.report()
+        total = report["time_ns"] or 1
+
+        lines = [f"Executed instructions: {report['count']}", f"Time: {report['time_ns'] / 1e6:.3f} ms", ""]
+        for title, key, columns in (("Opcodes", "opcodes", ["opcode"]), ("Label regions", "labels", ["label"]), ("Instructions", "instructions", ["order", "opcode", "label"])):
+            lines.append(f"{title}:")
+            lines.append(f"  {'  '.join(f'{column:<16}' for column in columns)}  {'count':>12}  {'time ms':>12}  {'%':>6}")
+            for item in report[key]:
+                lines.append(f"  {'  '.join(f'{str(item[column]):<16}' for column in columns)}  {item['count']:>12}  {item['time_ns'] / 1e6:>12.3f}  {100 * item['time_ns'] / total:>6.2f}")
+            lines.append("")
+
+        # Text report and JSON report next to it
+        try:
+            with open(self.path, "w") as report_file:
+                report_file.write("\n".join(lines))
+            with open(f"{self.path}.json", "w") as report_file:
+                json.dump(report, report_file, indent=2)
+        except OSError:
+            error.exit(error.code.ERR_OUTPUT, f"Profile file '{self.path}' could not be written\n")
@@ -5,7 +5,122 @@
 # Date: 2023-04-07
 
 from . import error
-import re
+import sys
+
+# Marker of defined variable without value and of frame slot without variable, values are
+# native (int, bool, str, float) and nil is None
+class _Marker:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self) -> str:
+        return self.name
+
+UNINITIALIZED = _Marker("uninitialized")
+UNDEFINED = _Marker("undefined")
+
+# Mutable string value of variable (CONCAT to same variable, SETCHAR), it never leaves frame slot,
+# because reading of variable returns text, which is joined again only after change
+class StringBuilder:
+    __slots__ = ("chars", "text")
+
+    # Shorter strings are concatenated and sliced directly
+    MIN_LENGTH = 64
+
+    def __init__(self, text: str):
+        self.chars = list(text)
+        self.text = text
+
+    def __len__(self) -> int:
+        return len(self.chars)
+
+    def __repr__(self) -> str:
+        return repr(self.materialize())
+
+    def append(self, text: str):
+        self.chars.extend(text)
+        self.text = None
+
+    def setchar(self, index: int, char: str):
+        self.chars[index] = char
+        self.text = None
+
+    def materialize(self) -> str:
+        if self.text is None:
+            self.text = "".join(self.chars)
+        return self.text
+
+def string_append(value, text: str):
+    # New value of variable after append, builder of variable is changed in place
+    if type(value) is StringBuilder:
+        value.append(text)
+        return value
+    if len(value) + len(text) < StringBuilder.MIN_LENGTH:
+        return value + text
+    builder = StringBuilder(value)
+    builder.append(text)
+    return builder
+
+def string_setchar(value, index: int, char: str):
+    # New value of variable after character replacement, builder of variable is changed in place
+    if type(value) is StringBuilder:
+        value.setchar(index, char)
+        return value
+    if len(value) < StringBuilder.MIN_LENGTH:
+        return value[:index] + char + value[index + 1:]
+    builder = StringBuilder(value)
+    builder.setchar(index, char)
+    return builder
+
+# Data stack of STACK extension, values are stored in preallocated list under stack pointer, so push
+# and pop do not resize list and clear only resets pointer (values above pointer are garbage)
+class DataStack:
+    __slots__ = ("items", "top")
+
+    # Initial capacity, storage is doubled when it is full
+    CAPACITY = 64
+
+    def __init__(self):
+        self.items = [None] * self.CAPACITY
+        self.top = 0
+
+    def __len__(self) -> int:
+        return self.top
+
+    def __repr__(self) -> str:
+        return repr(self.items[:self.top])
+
+    def grow(self):
+        # Storage is extended in place, so bound references to items stay valid
+        self.items.extend([None] * len(self.items))
+
+    def push(self, value):
+        top = self.top
+        if top == len(self.items):
+            self.grow()
+        self.items[top] = value
+        self.top = top + 1
+
+    def pop(self):
+        top = self.top - 1
+        if top < 0:
+            error.exit(error.code.ERR_CODE_VALUE, "Data stack is empty\n")
+        self.top = top
+        return self.items[top]
+
+    def pop2(self) -> tuple:
+        # Two values on top of stack in order of pushing
+        top = self.top - 2
+        if top < 0:
+            error.exit(error.code.ERR_CODE_VALUE, "Data stack is empty\n")
+        self.top = top
+        items = self.items
+        return items[top], items[top + 1]
+
+    def clear(self):
+        self.top = 0
 
 class Program:
 
@@ -13,6 +128,7 @@ class Program:
         INT = "int"
         BOOL = "bool"
         STRING = "string"
+        FLOAT = "float"
         NIL = "nil"
         VAR = "var"
 
@@ -21,24 +137,91 @@ class Program:
         LF = "LF"
         TF = "TF"
 
-    _labels = {}
-    _instructions = []
-    _instructions_executed = 0
-    _instruction_next_index = 0
-    _exit_code = 0
-    _frame_global = {}
-    _frame_local = None
-    _frame_temp = None
-    _frame_stack = []
-    _data_stack = []
-    _call_stack = []
+    # Variable reference resolved at load time (frame and interned name)
+    class Variable:
+        __slots__ = ("frame", "name", "slot")
+
+        def __init__(self, frame: str, name: str):
+            self.frame = frame
+            self.name = sys.intern(name)
+            # Index of variable in frame, assigned when instruction is added to program
+            self.slot = None
+
+        def __repr__(self) -> str:
+            return f"{self.frame}@{self.name}"
+
+        @classmethod
+        def from_str(cls, var: str):
+            # Split variable on frame and name, None if it is not valid
+            frame, separator, name = var.partition("@") if var else ("", "", "")
+            if not separator or not name or frame not in (Program._Frame.GF, Program._Frame.LF, Program._Frame.TF):
+                return None
+            return cls(frame, name)
+
+    # Frame which counts its initialized variables (statistics of variables)
+    class _CountedFrame(list):
+        __slots__ = ("initialized",)
+
+        def __init__(self, size):
+            super().__init__([UNDEFINED] * size)
+            self.initialized = 0
+
+    # Number of buffered writes before output is written to file
+    _OUTPUT_CHUNKS = 4096
+
+    _vars_tracking = False
 
     input_file = None
     input_close = False
+    output_file = None
+    output_close = False
 
-    def __init__(self, input=None):
+    def __init__(self, input=None, output=None):
 
+        # Loaded code
+        self._labels = {}
+        self._instructions = []
+
+        # Slots of variable names in global frame and in local and temp frames
+        self._slots_global = {}
+        self._slots_local = {}
+
+        # Output buffer, list is kept between executions
+        self._output_chunks = []
+
+        # Data stack is kept between executions, its methods are called without wrapper
+        self._data_stack = DataStack()
+        self.data_stack_push = self._data_stack.push
+        self.data_stack_pop = self._data_stack.pop
+        self.data_stack_pop2 = self._data_stack.pop2
+        self.data_stack_clear = self._data_stack.clear
+
+        # Execution state
+        self.reset(input, output)
+
+    def __del__(self):
+        self.input_close_file()
+        self.output_close_file()
+
+    def reset(self, input=None, output=None):
+        # Reset execution state, open input and output file, loaded instructions and labels are kept
+        self._instructions_executed = 0
+        self._instructions_fused = 0
+        self._instruction_next_index = 0
+        self._exit_code = 0
+        self._frame_global = self._frame_new(len(self._slots_global))
+        self._frame_local = None
+        self._frame_temp = None
+        self._frame_stack = []
+        self._data_stack.clear()
+        self._call_stack = []
+        self._vars_initialized = 0
+        self._vars_max = 0
+
+        self.input_close_file()
         self.input_file = input
+        self._input_lines = None
+        self._input_index = 0
 
         # Open input file
         if not hasattr(self.input_file, "read"):
@@ -48,104 +231,192 @@ class Program:
             except:
                 error.exit(error.code.ERR_INPUT, f"Input file '{self.input_file}' does not exist or could not be read\n")
 
-    def __del__(self):
+        self.output_close_file()
+        self.output_file = sys.stdout if output is None else output
+
+        # Open output file with large buffer
+        if not hasattr(self.output_file, "write"):
+            try:
+                self.output_file = open(self.output_file, "w", buffering=1 << 20)
+                self.output_close = True
+            except:
+                error.exit(error.code.ERR_OUTPUT, f"Output file '{self.output_file}' could not be opened\n")
+
+        self._output_chunks.clear()
+        error.flush_output = self.output_flush
+
+    def input_close_file(self):
         # Close input file
         if self.input_close:
             self.input_file.close()
+            self.input_close = False
+
+    def input_read(self, type):
+        # Whole input is read at first read and split to lines
+        if self._input_lines is None:
+            try:
+                data = self.input_file.read()
+            except:
+                data = ""
+            self._input_lines = data.split("\n")
+            if self._input_lines[-1] == "":
+                self._input_lines.pop()
+
+        # Nil at the end of input
+        index = self._input_index
+        if index >= len(self._input_lines):
+            return None
+        self._input_index = index + 1
+        value = self._input_lines[index].strip()
+
+        # Conversion to type, nil if value is not valid
+        if type == str:
+            return value
+        if type == int:
+            try:
+                return int(value)
+            except ValueError:
+                return None
+        if type == bool and value:
+            return value.lower() == "true"
+        if type == float:
+            try:
+                return float.fromhex(value)
+            except (ValueError, OverflowError):
+                return None
+        return None
+
+    def output_close_file(self):
+        # Flush and close output file
+        self.output_flush()
+        if self.output_close:
+            self.output_file.close()
+            self.output_close = False
+        self.output_file = None
+
+    def output_write(self, text: str):
+        self._output_chunks.append(text)
+        if len(self._output_chunks) >= self._OUTPUT_CHUNKS:
+            self._output_drain()
+
+    def output_flush(self):
+        if self.output_file is not None:
+            self._output_drain()
+            self.output_file.flush()
+
+    def _output_drain(self):
+        # Write buffered chunks at once
+        if self._output_chunks:
+            self.output_file.write("".join(self._output_chunks))
+            self._output_chunks.clear()
+
+    def var_define(self, var):
+        frame = self._var_frame(var)
 
-    def var_define(self, var, type=None, value=None):
         # Check if variable is already defined
-        if self.var_is_defined(var):
+        if frame[var.slot] is not UNDEFINED:
             error.exit(error.code.ERR_XML_SEMANTIC, "Variable is already defined\n")
 
-        var_frame = re.split(r'@', var)[0]
-        var_name = re.split(r'@', var)[1]
-        match var_frame:
-            case self._Frame.GF:
-                self._frame_global[var_name] = type, value
-            case self._Frame.LF:
-                if self._frame_local is None:
-                    error.exit(error.code.ERR_CODE_FRAME, "Local frame is not defined\n")
-                self._frame_local[var_name] = type, value
-            case self._Frame.TF:
-                if self._frame_temp is None:
-                    error.exit(error.code.ERR_CODE_FRAME, "Temporary frame is not defined\n")
-                self._frame_temp[var_name] = type, value
+        frame[var.slot] = UNINITIALIZED
+
+    def var_set(self, var, value):
+        frame = self._var_frame(var)
 
-    def var_set(self, var, type, value):
-        if not self.var_is_defined(var):
+        if frame[var.slot] is UNDEFINED:
             error.exit(error.code.ERR_CODE_VARIABLE, "Variable is not defined\n")
-        
-        var_frame = re.split(r'@', var)[0]
-        var_name = re.split(r'@', var)[1]
-        match var_frame:
-            case self._Frame.GF:
-                self._frame_global[var_name] = type, value
-            case self._Frame.LF:
-                if self._frame_local is None:
-                    error.exit(error.code.ERR_CODE_FRAME, "Local frame is not defined\n")
-                self._frame_local[var_name] = type, value
-            case self._Frame.TF:
-                if self._frame_temp is None:
-                    error.exit(error.code.ERR_CODE_FRAME, "Temporary frame is not defined\n")
-                self._frame_temp[var_name] = type, value
 
-    def var_get(self, var, must=False) -> tuple:
-        if not self.var_is_defined(var):
+        frame[var.slot] = value
+
+    def var_slot_assign(self, var):
+        # Global variables have own slots, local and temp frames share slots, because temp frame becomes local frame
+        slots = self._slots_global if var.frame == self._Frame.GF else self._slots_local
+        slot = slots.get(var.name)
+        if slot is None:
+            slot = slots[var.name] = len(slots)
+            if var.frame == self._Frame.GF:
+                self._frame_global.append(UNDEFINED)
+        var.slot = slot
+
+    def vars_tracking_enable(self):
+        # Replace methods by variants which count initialized variables, must be called before execution
+        self._vars_tracking = True
+        self._frame_global = self._CountedFrame(len(self._slots_global))
+        self.var_set = self._var_set_counted
+        self.frame_create = self._frame_create_counted
+        self.frame_pop = self._frame_pop_counted
+
+    def vars_max(self) -> int:
+        # Maximum count of initialized variables in all frames at once
+        return self._vars_max
+
+    def _var_set_counted(self, var, value):
+        frame = self._var_frame(var)
+
+        old = frame[var.slot]
+        if old is UNDEFINED:
             error.exit(error.code.ERR_CODE_VARIABLE, "Variable is not defined\n")
-        if must and not self.var_is_initialized(var):
+
+        # Variable is initialized for the first time
+        if old is UNINITIALIZED:
+            frame.initialized += 1
+            self._vars_initialized += 1
+            if self._vars_initialized > self._vars_max:
+                self._vars_max = self._vars_initialized
+
+        frame[var.slot] = value
+
+    def var_get(self, var, must=False):
+        value = self._var_frame(var)[var.slot]
+
+        if value is UNDEFINED:
+            error.exit(error.code.ERR_CODE_VARIABLE, "Variable is not defined\n")
+        if must and value is UNINITIALIZED:
             error.exit(error.code.ERR_CODE_VALUE, f"Variable is not initialized\n")
+        if type(value) is StringBuilder:
+            return value.materialize()
 
-        var_frame = re.split(r'@', var)[0]
-        var_name = re.split(r'@', var)[1]
-        match var_frame:
-            case self._Frame.GF:
-                return self._frame_global[var_name]
-            case self._Frame.LF:
-                if self._frame_local is None:
-                    error.exit(error.code.ERR_CODE_FRAME, "Local frame is not defined\n")
-                return self._frame_local[var_name]
-            case self._Frame.TF:
-                if self._frame_temp is None:
-                    error.exit(error.code.ERR_CODE_FRAME, "Temporary frame is not defined\n")
-                return self._frame_temp[var_name]
+        return value
+
+    def var_get_mutable(self, var):
+        # Initialized value of variable, string builder is returned as it is
+        value = self._var_frame(var)[var.slot]
+
+        if value is UNDEFINED:
+            error.exit(error.code.ERR_CODE_VARIABLE, "Variable is not defined\n")
+        if value is UNINITIALIZED:
+            error.exit(error.code.ERR_CODE_VALUE, f"Variable is not initialized\n")
+
+        return value
 
     def var_is_defined(self, var) -> bool:
-        var_frame = re.split(r'@', var)[0]
-        var_name = re.split(r'@', var)[1]
-        match var_frame:
-            case self._Frame.GF:
-                if var_name in self._frame_global:
-                    return True
-            case self._Frame.LF:
-                if self._frame_local is None:
-                    error.exit(error.code.ERR_CODE_FRAME, "Local frame is not defined\n")
-                if var_name in self._frame_local:
-                    return True
-            case self._Frame.TF:
-                if self._frame_temp is None:
-                    error.exit(error.code.ERR_CODE_FRAME, "Temporary frame is not defined\n")
-                if var_name in self._frame_temp:
-                    return True
-        return False
-    
+        return self._var_frame(var)[var.slot] is not UNDEFINED
+
     def var_is_initialized(self, var) -> bool:
-        var_frame = re.split(r'@', var)[0]
-        var_name = re.split(r'@', var)[1]
-        match var_frame:
+        return self._var_frame(var)[var.slot] is not UNINITIALIZED
+
+    def _frame_dump(self, frame, slots) -> dict:
+        # Defined variables of frame by name
+        if frame is None:
+            return None
+        return {name: frame[slot] for name, slot in slots.items() if frame[slot] is not UNDEFINED}
+
+    def _var_frame(self, var) -> list:
+        # Get frame of variable reference
+        match var.frame:
             case self._Frame.GF:
-                return self._frame_global[var_name][0] != None
+                return self._frame_global
             case self._Frame.LF:
                 if self._frame_local is None:
                     error.exit(error.code.ERR_CODE_FRAME, "Local frame is not defined\n")
-                return self._frame_local[var_name][0] != None
+                return self._frame_local
             case self._Frame.TF:
                 if self._frame_temp is None:
                     error.exit(error.code.ERR_CODE_FRAME, "Temporary frame is not defined\n")
-                return self._frame_temp[var_name][0] != None
+                return self._frame_temp
 
-    def label_create(self, label):
-        self._labels[label] = self.instructions_count()
+    def label_create(self, label, index=None):
+        # Label points to next added instruction by default
+        self._labels[label] = self.instructions_count() if index is None else index
 
     def label_get_index(self, label) -> int:
         # Label verification
@@ -159,7 +430,16 @@ class Program:
 
     def frame_create(self):
         # Create new temp frame
-        self._frame_temp = {}
+        self._frame_temp = [UNDEFINED] * len(self._slots_local)
+
+    def _frame_create_counted(self):
+        # Variables of old temp frame are lost
+        if self._frame_temp is not None:
+            self._vars_initialized -= self._frame_temp.initialized
+        self._frame_temp = self._CountedFrame(len(self._slots_local))
+
+    def _frame_new(self, size) -> list:
+        return self._CountedFrame(size) if self._vars_tracking else [UNDEFINED] * size
 
     def frame_push(self):
         # Check if temp frame is defined (empty temp frame)
@@ -188,6 +468,12 @@ class Program:
         else:
             self._frame_local = None
 
+    def _frame_pop_counted(self):
+        # Variables of old temp frame are lost
+        if self._frame_local is not None and self._frame_temp is not None:
+            self._vars_initialized -= self._frame_temp.initialized
+        Program.frame_pop(self)
+
     def call_stack_push(self, index):
         self._call_stack.append(index)
 
@@ -196,17 +482,6 @@ class Program:
             error.exit(error.code.ERR_CODE_VALUE, "Call stack is empty\n")
         return self._call_stack.pop()
 
-    def data_stack_push(self, type, value):
-        self._data_stack.append((type, value))
-
-    def data_stack_pop(self) -> tuple:
-        if len(self._data_stack) == 0:
-            error.exit(error.code.ERR_CODE_VALUE, "Data stack is empty\n")
-        return self._data_stack.pop()
-
-    def data_stack_clear(self):
-        self._data_stack = []
-
     def instruction_counter_inc(self):
         self._instructions_executed += 1
         self._instruction_next_index += 1
@@ -219,19 +494,29 @@ class Program:
         return self._instruction_next_index
 
     def instructions_executed(self) -> int:
-        return self._instructions_executed
+        # Fused instructions of compiled code count their other instructions separately
+        return self._instructions_executed + self._instructions_fused
 
     def instruction_add(self, instruction):
         self._instructions.append(instruction)
+        for arg_type, value in instruction.args.values():
+            if arg_type == self.DataType.VAR:
+                self.var_slot_assign(value)
 
     def instructions_count(self) -> int:
         return len(self._instructions)
 
     def execute(self):
-        while self.instruction_counter_get() < self.instructions_count():
-            self._instructions[self.instruction_counter_get()].execute(self)
-        
+        try:
+            instructions = self._instructions
+            count = len(instructions)
+            while self._instruction_next_index < count:
+                instructions[self._instruction_next_index].execute(self)
+        finally:
+            self.output_flush()
+
     def exit(self, code):
+        self.output_flush()
         self._exit_code = code
         self.instruction_counter_set(self.instructions_count())
 
@@ -242,10 +527,10 @@ class Program:
         return "DEBUG:\n"\
         +f"Instruction line: {self.instruction_counter_get()}\n"\
         +f"Instructions executed: {self.instructions_executed()}\n"\
-        +f"Global frame: {self._frame_global}\n"\
-        +f"Local frame: {self._frame_local}\n"\
-        +f"Temporary frame: {self._frame_temp}\n"\
-        +f"Stack: {self._frame_stack}\n"\
+        +f"Global frame: {self._frame_dump(self._frame_global, self._slots_global)}\n"\
+        +f"Local frame: {self._frame_dump(self._frame_local, self._slots_local)}\n"\
+        +f"Temporary frame: {self._frame_dump(self._frame_temp, self._slots_local)}\n"\
+        +f"Stack: {[self._frame_dump(frame, self._slots_local) for frame in self._frame_stack]}\n"\
         +f"Data stack: {self._data_stack}\n"\
         +f"Call stack: {self._call_stack}\n"
         
\ No newline at end of file
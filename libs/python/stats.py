@@ -0,0 +1,69 @@
+# IPP 2023, project 2
+# Author: Marek Gergel, xgerge01
+# File: stats.py
+# Description: Statistics of interpretation (STATI extension)
+# Date: 2023-04-07
+
+from . import error,instruction,optimizer,program
+import collections
+
+class Stats:
+
+    # Instructions not counted as executed, LABEL is counted as in .stats files of tests/koule
+    _NOT_COUNTED = (instruction.DPRINT, instruction.BREAK)
+
+    def __init__(self, prog: program.Program, groups: list):
+        self.prog = prog
+        self.groups = groups
+        self.instructions = prog._instructions
+
+    def insts(self, counts: list) -> int:
+        return sum(count for instruction_in, count in zip(self.instructions, counts) if not isinstance(instruction_in, self._NOT_COUNTED))
+
+    def hot(self, counts: list) -> str:
+        # Order of most executed instruction, lowest order if there are more of them
+        hot = None
+        for instruction_in, count in zip(self.instructions, counts):
+            if count == 0 or isinstance(instruction_in, self._NOT_COUNTED):
+                continue
+            if hot is None or count > hot[0] or (count == hot[0] and instruction_in.order < hot[1]):
+                hot = count, instruction_in.order
+        return "" if hot is None else str(hot[1])
+
+    def vars(self) -> int:
+        return self.prog.vars_max()
+
+    def frequent(self) -> str:
+        # Most frequent opcodes in source code
+        opcodes = collections.Counter(instruction_in.opcode.upper() for instruction_in in self.instructions)
+        if not opcodes:
+            return ""
+        most = max(opcodes.values())
+        return ",".join(sorted(opcode for opcode, count in opcodes.items() if count == most))
+
+    def write(self, counts: list):
+        # Statistics are computed from instructions before optimization
+        self.instructions, counts = optimizer.counts_original(self.prog._instructions, counts)
+
+        for path, actions in self.groups:
+            lines = []
+            for action, value in actions:
+                match action:
+                    case "insts":
+                        lines.append(f"{self.insts(counts)}\n")
+                    case "hot":
+                        lines.append(f"{self.hot(counts)}\n")
+                    case "vars":
+                        lines.append(f"{self.vars()}\n")
+                    case "frequent":
+                        lines.append(f"{self.frequent()}\n")
+                    case "print":
+                        lines.append(value)
+                    case "eol":
+                        lines.append("\n")
+
+            try:
+                with open(path, "w") as stats_file:
+                    stats_file.write("".join(lines))
+            except OSError:
+                error.exit(error.code.ERR_OUTPUT, f"Statistics file '{path}' could not be written\n")
@@ -0,0 +1,272 @@
+# IPP 2023, project 2
+# Author: Marek Gergel, xgerge01
+# File: test.py
+# Description: Parallel test runner for parse.php and interpret.py
+# Date: 2023-04-07
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse,functools,html,json,os,re,shlex,shutil,subprocess,sys,tempfile
+
+ERR_PARAMS = 10
+ERR_FILE = 41
+
+# Configurations of interpreter (engine and optimization level) run by '--matrix'
+MATRIX = [[f"--engine={engine}", f"-O{level}"] for engine in ("interpret", "compiled", "jit") for level in (0, 1)]
+
+class Mode:
+    BOTH = "both"
+    PARSE = "parse-only"
+    INTERPRET = "int-only"
+
+class Config:
+
+    def __init__(self, args):
+        self.directory = args.directory
+        self.recursive = args.recursive
+        self.parse_script = args.parse_script
+        self.int_script = args.int_script
+        self.jexampath = args.jexampath
+        self.noclean = args.noclean
+        self.jobs = args.jobs
+        self.json = args.json
+        self.html = args.html
+        self.matrix = args.matrix
+        self.php = shutil.which("php8.1") or shutil.which("php")
+        self.python = sys.executable
+
+        if args.parse_only:
+            self.mode = Mode.PARSE
+        elif args.int_only:
+            self.mode = Mode.INTERPRET
+        else:
+            self.mode = Mode.BOTH
+
+def parse_params() -> Config:
+    parser = argparse.ArgumentParser(description='Test runner for parse.php and interpret.py', add_help=False)
+    parser.add_argument('--directory', metavar='path', type=str, default='.', help='look for tests in specified directory')
+    parser.add_argument('--recursive', action='store_true', help='look for tests also in subdirectories')
+    parser.add_argument('--parse-script', metavar='file', type=str, help='PHP 8.1 script for analysis of IPPcode23 source')
+    parser.add_argument('--int-script', metavar='file', type=str, help='Python 3.10 script for interpretation of XML representation of IPPcode23')
+    parser.add_argument('--parse-only', action='store_true', help='test only parser')
+    parser.add_argument('--int-only', action='store_true', help='test only interpreter')
+    parser.add_argument('--jexampath', metavar='path', type=str, help='directory containing jexamxml.jar and options')
+    parser.add_argument('--noclean', action='store_true', help='keep temporary files')
+    parser.add_argument('--jobs', metavar='count', type=int, default=os.cpu_count(), help='number of tests run in parallel')
+    parser.add_argument('--json', metavar='file', type=str, help='write results as JSON to file')
+    parser.add_argument('--html', metavar='file', type=str, help='write results as HTML to file instead of standard output')
+    parser.add_argument('--matrix', action='store_true', help='run interpreter tests with every engine and optimization level')
+    parser.add_argument('--help', action='store_true', help='show this help message and exit')
+
+    args, unknown = parser.parse_known_args()
+    if args.help:
+        parser.print_help()
+        sys.exit(0)
+    if unknown:
+        sys.stderr.write(f"Unknown parameter '{unknown[0]}'\n")
+        sys.exit(ERR_PARAMS)
+
+    # Check parameter combinations
+    if args.int_only and (args.parse_only or args.parse_script or args.jexampath):
+        sys.stderr.write("Parameter '--int-only' cannot be combined with '--parse-only', '--parse-script' or '--jexampath'\n")
+        sys.exit(ERR_PARAMS)
+    if args.matrix and not args.int_only:
+        sys.stderr.write("Parameter '--matrix' requires '--int-only'\n")
+        sys.exit(ERR_PARAMS)
+    if args.parse_only and args.int_script:
+        sys.stderr.write("Parameter '--parse-only' cannot be combined with '--int-script'\n")
+        sys.exit(ERR_PARAMS)
+    if args.jobs is None or args.jobs < 1:
+        sys.stderr.write("Parameter '--jobs' must be positive integer\n")
+        sys.exit(ERR_PARAMS)
+
+    args.parse_script = args.parse_script or "parse.php"
+    args.int_script = args.int_script or "interpret.py"
+    args.jexampath = args.jexampath or "/pub/courses/ipp/jexamxml/"
+
+    # Check required files
+    required = [args.directory]
+    if not args.parse_only:
+        required.append(args.int_script)
+    if not args.int_only:
+        required.append(args.parse_script)
+    if args.parse_only:
+        required += [os.path.join(args.jexampath, "jexamxml.jar"), os.path.join(args.jexampath, "options")]
+    for path in required:
+        if not os.path.exists(path):
+            sys.stderr.write(f"File '{path}' not found\n")
+            sys.exit(ERR_FILE)
+    if not args.int_only and not (shutil.which("php8.1") or shutil.which("php")):
+        sys.stderr.write("PHP interpreter 'php8.1' or 'php' not found\n")
+        sys.exit(ERR_FILE)
+
+    return Config(args)
+
+def discover(config: Config) -> list:
+    # Find tests (.src with optional .in, .out, .rc and for interpreter .args and files of COMPARED) sorted by path
+    tests = []
+    for directory, subdirectories, files in os.walk(config.directory):
+        if not config.recursive:
+            subdirectories.clear()
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.endswith(".src"):
+                tests.append(os.path.join(directory, name[:-len(".src")]))
+    return tests
+
+def _read(path: str, default: str = "") -> str:
+    try:
+        with open(path, "r", errors="replace") as file:
+            return file.read()
+    except OSError:
+        return default
+
+def _profile_text(text: str) -> list:
+    # Times differ between runs, so rows of every section are compared without them and sorted
+    return [sorted(" ".join(re.sub(r"[0-9]+\.[0-9]+", "", line).split()) for line in section.splitlines()) for section in text.split("\n\n")]
+
+def _profile_json(text: str):
+    # Times differ between runs, so they only have to be integers and lists are compared sorted
+    def strip(value):
+        if isinstance(value, dict):
+            return {key: 0 if key == "time_ns" and type(item) is int else strip(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return sorted((strip(item) for item in value), key=json.dumps)
+        return value
+    try:
+        return strip(json.loads(text))
+    except ValueError:
+        return None
+
+# Files written by run to '{tmp}' are compared with files of test with same extension
+COMPARED = {"stats": str, "output": str, "profile": _profile_text, "profile.json": _profile_json}
+
+def _run(command: list, stdin: str, input_data: bytes = None) -> tuple:
+    if input_data is not None:
+        process = subprocess.run(command, input=input_data, capture_output=True)
+    else:
+        with open(stdin, "rb") as stdin_file:
+            process = subprocess.run(command, stdin=stdin_file, capture_output=True)
+    return process.returncode, process.stdout
+
+def run_test(config: Config, test: str, options: list) -> dict:
+    source = f"{test}.src"
+    input = f"{test}.in" if os.path.exists(f"{test}.in") else os.devnull
+    expected_out = _read(f"{test}.out")
+    expected_rc = int(_read(f"{test}.rc", "0").strip() or 0)
+
+    with tempfile.TemporaryDirectory(prefix="ipp-test-") as temp_dir:
+        if config.mode == Mode.INTERPRET:
+            # Every line of '.args' is one run with its parameters instead of '--source' and '--input', all runs have to give
+            # expected result
+            placeholders = {"{src}": source, "{in}": input, "{dir}": os.path.dirname(test), "{tmp}": temp_dir}
+            runs = [shlex.split(functools.reduce(lambda line, item: line.replace(*item), placeholders.items(), line))
+                for line in _read(f"{test}.args").splitlines() if line.strip()] or [[f"--source={source}", f"--input={input}"]]
+            written = set()
+            for arguments in runs:
+                rc, output = _run([config.python, config.int_script] + options + arguments, os.devnull)
+                ok = rc == expected_rc and (rc != 0 or output.decode(errors="replace") == expected_out)
+
+                # Files written by run are compared and removed, so next run has to write them again
+                for name, normalize in COMPARED.items():
+                    path = os.path.join(temp_dir, name)
+                    if os.path.exists(path):
+                        ok = ok and normalize(_read(path)) == normalize(_read(f"{test}.{name}"))
+                        written.add(name)
+                        os.remove(path)
+                if not ok:
+                    break
+
+            # Every expected file has to be written by some run
+            ok = ok and all(name in written for name in COMPARED if os.path.exists(f"{test}.{name}"))
+
+        elif config.mode == Mode.PARSE:
+            rc, output = _run([config.php, config.parse_script], source)
+            ok = rc == expected_rc
+            if ok and rc == 0:
+                # XML outputs are compared by jexamxml
+                output_file = os.path.join(temp_dir, "out.xml")
+                with open(output_file, "wb") as file:
+                    file.write(output)
+                jexamxml = subprocess.run(["java", "-jar", os.path.join(config.jexampath, "jexamxml.jar"), output_file, f"{test}.out",
+                    os.path.join(temp_dir, "delta.xml"), "-D", os.path.join(config.jexampath, "options")], capture_output=True)
+                ok = jexamxml.returncode == 0
+
+        else:
+            rc, xml = _run([config.php, config.parse_script], source)
+            if rc == 0:
+                rc, output = _run([config.python, config.int_script, f"--input={input}"], None, xml)
+            else:
+                output = b""
+            ok = rc == expected_rc and (rc != 0 or output.decode(errors="replace") == expected_out)
+
+        if config.noclean:
+            with open(f"{test}_tempOut.temp", "wb") as file:
+                file.write(output)
+
+    return {
+        "name": " ".join([os.path.basename(test)] + options),
+        "path": os.path.dirname(test),
+        "ok": ok,
+        "rc": rc,
+        "expected_rc": expected_rc,
+        "output": output.decode(errors="replace"),
+        "expected_output": expected_out,
+    }
+
+def report_json(results: list) -> str:
+    passed = sum(result["ok"] for result in results)
+    return json.dumps({"total": len(results), "passed": passed, "failed": len(results) - passed, "tests": results}, indent=2)
+
+def report_html(results: list) -> str:
+    passed = sum(result["ok"] for result in results)
+    page = ['<!DOCTYPE html>\n<html>\n<head>\n<meta charset="UTF-8">\n<meta name="description" content="Test results">\n<style>\n'
+        'th, td { padding-left:10px; padding-right:10px; color:white; }\nh1,h2,h3,h4 { color:white; }\n'
+        'textarea { background-color: rgb(18, 18, 18); color:white; }\n'
+        'body { padding-left: 1em; padding-right: 1em; background-color: rgb(18, 18, 18); }\n</style>\n</head>\n<body>\n'
+        '<h1 style="text-align: center;">Test result</h1>\n'
+        f'<h2>Tests run: {len(results)}</h2>\n<h2>Passed: {passed}</h2>\n<h2>Failed: {len(results) - passed}</h2>\n']
+
+    for ok, title, color in ((False, "Failed tests", "red"), (True, "Passed tests", "green")):
+        page.append(f'<hr>\n<h3 style="text-align: center; color:{color}">{title}</h3>\n')
+        path = None
+        for result in results:
+            if result["ok"] != ok:
+                continue
+            # New table for every directory
+            if result["path"] != path:
+                if path is not None:
+                    page.append('</table>\n')
+                path = result["path"]
+                page.append(f'<hr><h4>{html.escape(path)}</h4>\n<table>\n<tr><th>Test name</th><th>Return code</th><th>Expected return code</th><th>Output</th><th>Expected output</th></tr>\n')
+            page.append(f'<tr><td>{html.escape(result["name"])}</td><td>{result["rc"]}</td><td>{result["expected_rc"]}</td>'
+                f'<td><textarea readonly rows=5 cols=50>{html.escape(result["output"])}</textarea></td>'
+                f'<td><textarea readonly rows=5 cols=50>{html.escape(result["expected_output"])}</textarea></td></tr>\n')
+        if path is not None:
+            page.append('</table>\n')
+
+    page.append('</body>\n</html>\n')
+    return "".join(page)
+
+if __name__ == '__main__':
+
+    # Parse script parameters
+    config = parse_params()
+
+    # Run tests in parallel, results keep order of discovered tests
+    # Parameters of test run are placed before parameters of '.args', so test can choose its own engine
+    tests = [(test, options) for test in discover(config) for options in (MATRIX if config.matrix else [[]])]
+    with ProcessPoolExecutor(max_workers=config.jobs) as executor:
+        results = list(executor.map(run_test, [config] * len(tests), *zip(*tests), chunksize=8))
+
+    # Write reports
+    if config.json:
+        with open(config.json, "w") as file:
+            file.write(report_json(results))
+    if config.html:
+        with open(config.html, "w") as file:
+            file.write(report_html(results))
+    else:
+        sys.stdout.write(report_html(results))
+
+    passed = sum(result["ok"] for result in results)
+    sys.stderr.write(f"Passed {passed}/{len(results)} tests\n")
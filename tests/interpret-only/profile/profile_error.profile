@@ -0,0 +1,27 @@
+Executed instructions: 16
+Time: 0.000 ms
+
+Opcodes:
+  opcode                   count       time ms       %
+  ADD                          4         0.000    0.00
+  JUMPIFNEQ                    4         0.000    0.00
+  DEFVAR                       1         0.000    0.00
+  MOVE                         1         0.000    0.00
+  WRITE                        1         0.000    0.00
+  LABEL                        5         0.000    0.00
+
+Label regions:
+  label                    count       time ms       %
+  loop                        12         0.000    0.00
+  <start>                      3         0.000    0.00
+  fail                         1         0.000    0.00
+
+Instructions:
+  order             opcode            label                    count       time ms       %
+  5                 ADD               loop                         4         0.000    0.00
+  6                 JUMPIFNEQ         loop                         4         0.000    0.00
+  1                 DEFVAR            <start>                      1         0.000    0.00
+  2                 MOVE              <start>                      1         0.000    0.00
+  3                 WRITE             <start>                      1         0.000    0.00
+  4                 LABEL             loop                         4         0.000    0.00
+  7                 LABEL             fail                         1         0.000    0.00
@@ -0,0 +1,33 @@
+Executed instructions: 25
+Time: 0.000 ms
+
+Opcodes:
+  opcode                   count       time ms       %
+  PUSHS                        6         0.000    0.00
+  ADD                          3         0.000    0.00
+  JUMPIFNEQ                    3         0.000    0.00
+  MUL                          3         0.000    0.00
+  DEFVAR                       2         0.000    0.00
+  WRITE                        1         0.000    0.00
+  POPS                         3         0.000    0.00
+  MOVE                         1         0.000    0.00
+  LABEL                        3         0.000    0.00
+
+Label regions:
+  label                    count       time ms       %
+  loop                        22         0.000    0.00
+  <start>                      3         0.000    0.00
+
+Instructions:
+  order             opcode            label                    count       time ms       %
+  5                 ADD               loop                         3         0.000    0.00
+  10                JUMPIFNEQ         loop                         3         0.000    0.00
+  6                 PUSHS             loop                         3         0.000    0.00
+  8                 MULS              loop                         3         0.000    0.00
+  1                 DEFVAR            <start>                      1         0.000    0.00
+  11                WRITE             loop                         1         0.000    0.00
+  9                 POPS              loop                         3         0.000    0.00
+  7                 PUSHS             loop                         3         0.000    0.00
+  3                 MOVE              <start>                      1         0.000    0.00
+  4                 LABEL             loop                         3         0.000    0.00
+  2                 DEFVAR            <start>                      1         0.000    0.00